@@ -4,14 +4,17 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 import logging
+import sqlalchemy.exc
 from .config import Config
-from flask_socketio import SocketIO, emit
+from .utils.replica import RoutingSession
+from .utils.metrics import MeteredSocketIO
+from flask_socketio import emit
 from flask import current_app, jsonify
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
-socketio = SocketIO(cors_allowed_origins="*")
+socketio = MeteredSocketIO(cors_allowed_origins="*")
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -44,15 +47,36 @@ def create_app(config_class=Config):
         console_handler.setFormatter(formatter)
         app.logger.addHandler(console_handler)
 
+    from .utils.db_pool import engine_options, make_psycopg_green, handle_pool_timeout
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    if app.config['DATABASE_REPLICA_URL']:
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}),
+                                          'replica': app.config['DATABASE_REPLICA_URL']}
+    make_psycopg_green()
+    app.register_error_handler(sqlalchemy.exc.TimeoutError, handle_pool_timeout)
+
     db.init_app(app)
+    db.session.session_factory.configure(expire_on_commit=app.config.get('SQLALCHEMY_EXPIRE_ON_COMMIT', True))
+
+    from .utils.query_stats import instrument_engine, start_request_timer, record_request_queries
+    from .utils.metrics import track_pool_checkouts, record_request_metrics
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            instrument_engine(engine)
+            track_pool_checkouts(engine, bind_key or 'primary')
+    app.before_request(start_request_timer)
+    app.after_request(record_request_queries)
+    app.after_request(record_request_metrics)
+
     migrate.init_app(app, db)
     jwt.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(app, message_queue=app.config['REDIS_URL'])
 
     # Import models to register them with SQLAlchemy
     from .models.user import User
     from .models.profile import Profile
-    from .models.media import Media
+    from .models.media import Media, Comment, Reaction, ReactionCounter
     from .models.friendship import Friendship
     from .models.console import PlayStation, Xbox, Steam, Nintendo, Discord
     from .models.notification import Notification
@@ -67,4 +91,15 @@ def create_app(config_class=Config):
     app.register_blueprint(notifications.bp)
     app.register_blueprint(health.bp)
 
+    from .utils.replica import pin_reads_after_write
+    if app.config['DATABASE_REPLICA_URL']:
+        app.after_request(pin_reads_after_write)
+
+    from .utils.upload_gc import start_upload_gc
+    from .utils.notification_pruner import start_notification_pruner
+    from .utils.chat_archive import start_chat_archiver
+    start_upload_gc(app)
+    start_notification_pruner(app)
+    start_chat_archiver(app)
+
     return app
\ No newline at end of file
@@ -7,13 +7,61 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    SQLALCHEMY_TRACK_MODIFICATIONS = True
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # Read-only handlers query this replica when set
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))  # Seconds a client reads from the primary after its own write
+    SQLALCHEMY_TRACK_MODIFICATIONS = False  # Nothing listens for Flask-SQLAlchemy's model signals
+    SQLALCHEMY_EXPIRE_ON_COMMIT = os.environ.get('SQLALCHEMY_EXPIRE_ON_COMMIT', '1') == '1'  # Reload loaded rows after each commit
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MEDIA_DERIVATIVE_SIZES = {'thumb': 320, 'web': 1280}  # variant name -> max width in pixels
+    FFMPEG_PATH = os.environ.get('FFMPEG_PATH')  # Falls back to ffmpeg on PATH for video posters
+    VIRUS_SCANNER_PATH = os.environ.get('VIRUS_SCANNER_PATH')  # Falls back to clamdscan/clamscan on PATH
+    MEDIA_WORKER_PROCESSES = int(os.environ.get('MEDIA_WORKER_PROCESSES', 2))
+    UPLOAD_GC_INTERVAL = int(os.environ.get('UPLOAD_GC_INTERVAL', 0))  # Seconds between GC runs, 0 disables
+    UPLOAD_GC_BATCH_SIZE = int(os.environ.get('UPLOAD_GC_BATCH_SIZE', 1000))
+    UPLOAD_GC_GRACE_SECONDS = int(os.environ.get('UPLOAD_GC_GRACE_SECONDS', 3600))  # Ignore files newer than this
+    REACTION_COUNTER_SHARDS = int(os.environ.get('REACTION_COUNTER_SHARDS', 8))  # Rows per media/type counter
+    NOTIFICATION_COALESCE_WINDOW = int(os.environ.get('NOTIFICATION_COALESCE_WINDOW', 3600))  # Seconds a grouped notification stays open
+    NOTIFICATION_EMIT_DEBOUNCE = float(os.environ.get('NOTIFICATION_EMIT_DEBOUNCE', 5))  # Seconds between pushes per group
+    NOTIFICATION_MAX_PER_USER = int(os.environ.get('NOTIFICATION_MAX_PER_USER', 500))  # Newest kept per user, 0 keeps all
+    NOTIFICATION_VIEWED_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_VIEWED_RETENTION_DAYS', 30))  # 0 keeps viewed ones
+    NOTIFICATION_PRUNE_BATCH_SIZE = int(os.environ.get('NOTIFICATION_PRUNE_BATCH_SIZE', 1000))
+    NOTIFICATION_PRUNE_INTERVAL = int(os.environ.get('NOTIFICATION_PRUNE_INTERVAL', 0))  # Seconds between runs, 0 disables
+    NOTIFICATION_PARTITION_RETENTION_MONTHS = int(os.environ.get('NOTIFICATION_PARTITION_RETENTION_MONTHS', 0))  # Partitioned Postgres only
+    REDIS_URL = os.environ.get('REDIS_URL')  # Shares presence and socket emits across workers when set
+    PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', 90))  # Seconds a connection counts as online without a heartbeat
+    PRESENCE_HEARTBEAT_INTERVAL = int(os.environ.get('PRESENCE_HEARTBEAT_INTERVAL', 30))
+    CHAT_MEMBERS_CACHE_TTL = int(os.environ.get('CHAT_MEMBERS_CACHE_TTL', 60))  # Seconds a room's member list is reused
+    CHAT_MEMBERS_CACHE_SIZE = int(os.environ.get('CHAT_MEMBERS_CACHE_SIZE', 10000))  # Rooms cached per worker
+    CHAT_TYPING_THROTTLE = float(os.environ.get('CHAT_TYPING_THROTTLE', 2))  # Seconds between typing emits per user and room
+    CHAT_MEMBERS_BATCH_LIMIT = int(os.environ.get('CHAT_MEMBERS_BATCH_LIMIT', 1000))  # User ids per room create or member change
+    CHAT_SYNC_MESSAGE_LIMIT = int(os.environ.get('CHAT_SYNC_MESSAGE_LIMIT', 500))  # Messages per /api/chat/sync response
+    CHAT_SYNC_RESCAN_IDS = int(os.environ.get('CHAT_SYNC_RESCAN_IDS', 100))  # How far below a sync cursor's marks uncommitted ids are still watched for
+    CHAT_ARCHIVE_FOLDER = os.environ.get('CHAT_ARCHIVE_FOLDER') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'archive')
+    CHAT_ARCHIVE_AFTER_MONTHS = int(os.environ.get('CHAT_ARCHIVE_AFTER_MONTHS', 0))  # Whole months older than this move to archive files, 0 disables
+    CHAT_ARCHIVE_BATCH_SIZE = int(os.environ.get('CHAT_ARCHIVE_BATCH_SIZE', 1000))
+    CHAT_ARCHIVE_INTERVAL = int(os.environ.get('CHAT_ARCHIVE_INTERVAL', 0))  # Seconds between partition upkeep and archiving, 0 disables
+    # Each worker serves up to gunicorn's worker-connections greenlets from this many connections;
+    # keep (DB_POOL_SIZE + DB_MAX_OVERFLOW) * workers under the server's max_connections
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # Connections kept open per worker, Postgres only
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))  # Extra connections opened under load and closed after
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds a request waits for a connection before a 503
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'  # Check connections on checkout to survive server restarts
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 15000))  # Milliseconds per statement, 0 disables; migrations, CLI commands and background jobs are exempt
+    SQL_SLOW_QUERY_MS = int(os.environ.get('SQL_SLOW_QUERY_MS', 500))  # Statements slower than this are logged, 0 disables
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', '1') == '1'  # Report per-request DB time and query count
+    SQL_QUERY_BUDGET_STRICT = os.environ.get('SQL_QUERY_BUDGET_STRICT', '0') == '1'  # Raise instead of logging when a view exceeds its @query_budget
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token /api/metrics requires when set
+    HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 5))  # Readiness results are reused this long
+    HEALTH_DB_SLOW_MS = int(os.environ.get('HEALTH_DB_SLOW_MS', 1000))  # A slower database ping marks the node not ready
+    HEALTH_MIN_FREE_DISK_MB = int(os.environ.get('HEALTH_MIN_FREE_DISK_MB', 500))  # Free space UPLOAD_FOLDER needs to stay ready
+    ACCOUNT_DELETE_BATCH_THRESHOLD = int(os.environ.get('ACCOUNT_DELETE_BATCH_THRESHOLD', 5000))  # Rows per table before batching
+    ACCOUNT_DELETE_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETE_BATCH_SIZE', 1000))
     JWT_TOKEN_LOCATION = ['headers', 'cookies']
     JWT_COOKIE_SECURE = True if os.environ.get('FLASK_ENV') == 'production' else False  # Always use secure cookies in production
     JWT_COOKIE_CSRF_PROTECT = True
@@ -21,4 +69,11 @@ class Config:
     JWT_CSRF_IN_COOKIES = True
     JWT_COOKIE_SAMESITE = 'Lax'  # Important for cross-site cookies
     # if os.environ.get('FLASK_ENV') == 'production':
-    #     JWT_COOKIE_DOMAIN = '.onrender.com'  # Adjust if needed for your domain
\ No newline at end of file
+    #     JWT_COOKIE_DOMAIN = '.onrender.com'  # Adjust if needed for your domain
+
+class ProductionConfig(Config):
+    # Sessions live for one request or socket event, so rows loaded before a
+    # commit are still current when the response is built from them
+    SQLALCHEMY_EXPIRE_ON_COMMIT = os.environ.get('SQLALCHEMY_EXPIRE_ON_COMMIT', '0') == '1'
+    # Without METRICS_TOKEN, /api/metrics answers 404 instead of serving metrics publicly
+    METRICS_TOKEN_REQUIRED = True
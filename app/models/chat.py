@@ -4,11 +4,20 @@ class ChatRoom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=True)  # For group chats
     is_group = db.Column(db.Boolean, default=False)  # True for group chats
-    user_ids = db.Column(db.JSON, nullable=False)  # List of user IDs in the chat room
+    dm_key = db.Column(db.String(50), nullable=True)  # "<low user id>:<high user id>" for 1-to-1 rooms
     last_message = db.Column(db.Text, nullable=True)  # Content of the last message
     last_message_timestamp = db.Column(db.DateTime, nullable=True)  # Timestamp of the last message
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.UniqueConstraint('dm_key', name='uq_chat_room_dm_key'),  # At most one 1-to-1 room per pair
+    )
+
+    @staticmethod
+    def direct_key(user_id, other_user_id):
+        low, high = sorted((int(user_id), int(other_user_id)))
+        return f"{low}:{high}"
+
 class UserChatAssociation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -18,20 +27,49 @@ class UserChatAssociation(db.Model):
     user = db.relationship('User', backref='chat_associations')
     chat_room = db.relationship('ChatRoom', backref='user_associations')
 
+    # Membership lives only here; these back the per-user and per-room lookups
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'chat_room_id', name='uq_user_chat_association_user_room'),
+        db.Index('ix_user_chat_association_chat_room_id', 'chat_room_id'),
+    )
+
+class ChatRoomRemoval(db.Model):
+    """A user leaving a room, kept so /api/chat/sync can tell their other devices."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    chat_room_id = db.Column(db.Integer, nullable=False)  # No foreign key: the room may be deleted with the membership
+    removed_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_chat_room_removal_user_id_id', 'user_id', 'id'),  # Per-user reads after a sync cursor
+    )
+
+    @staticmethod
+    def record(room_id, user_ids):
+        if user_ids:
+            db.session.execute(db.insert(ChatRoomRemoval),
+                               [{"user_id": member_id, "chat_room_id": room_id} for member_id in user_ids])
+
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('chat_room.id'), nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
+    client_msg_id = db.Column(db.String(64), nullable=True)  # Client-generated key that makes resends idempotent
 
     room = db.relationship('ChatRoom', backref='messages')
     sender = db.relationship('User', backref='sent_messages')
 
+    __table_args__ = (
+        db.UniqueConstraint('sender_id', 'client_msg_id', name='uq_chat_message_sender_client_msg_id'),
+        db.Index('ix_chat_message_room_id_id', 'room_id', 'id'),  # Per-room history and sync reads
+    )
+
     @staticmethod
     def update_last_message(room_id, content):
-        room = ChatRoom.query.get(room_id)
-        if room:
-            room.last_message = content
-            room.last_message_timestamp = db.func.current_timestamp()
-            db.session.commit()
+        # One UPDATE instead of loading the room to set two columns
+        ChatRoom.query.filter_by(id=room_id).update({
+            ChatRoom.last_message: content,
+            ChatRoom.last_message_timestamp: db.func.current_timestamp()
+        }, synchronize_session=False)
@@ -5,14 +5,28 @@ class Media(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     media_type = db.Column(db.String(10))
+    mime_type = db.Column(db.String(50))  # Detected from the file's leading bytes
     file_path = db.Column(db.String(255))
     storage_type = db.Column(db.String(20))
+    variants = db.Column(db.JSON, nullable=True)  # Resized derivatives, e.g. {"thumb": "<file>.thumb.jpg"}
+    processing_status = db.Column(db.String(20), default='pending')  # pending, ready, failed
+    file_hash = db.Column(db.String(64))  # SHA-256 of the stored file
+    file_size = db.Column(db.BigInteger)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Kept in step by add/delete_comment
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     
     user = db.relationship("User", back_populates="media")
     # Add relationship to comments
     comments = db.relationship('Comment', backref='media', lazy='dynamic', cascade='all, delete-orphan')
 
+    # Processing statuses; rejected uploads are deleted, so REJECTED only appears in events
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    REJECTED = 'rejected'
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -21,4 +35,35 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     
     # Relationship with User
-    user = db.relationship('User', backref='comments') 
\ No newline at end of file
+    user = db.relationship('User', backref='comments')
+
+    # Serves the per-media cursor pagination in get_comments
+    __table_args__ = (db.Index('ix_comment_media_id_id', 'media_id', 'id'),)
+
+
+class Reaction(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id'), nullable=False)
+    reaction_type = db.Column(db.String(20), nullable=False, default='like')
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+    # One reaction of each type per user; the unique index also serves "did I react" lookups
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'media_id', 'reaction_type', name='uq_reaction_user_media_type'),
+        db.Index('ix_reaction_media_id', 'media_id'),
+    )
+
+    LIKE = 'like'
+    LOVE = 'love'
+    LAUGH = 'laugh'
+    WOW = 'wow'
+    TYPES = (LIKE, LOVE, LAUGH, WOW)
+
+class ReactionCounter(db.Model):
+    # Each media/type total is split over several shard rows so concurrent
+    # reactions on a hot post update different rows; the total is their sum
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id'), primary_key=True)
+    reaction_type = db.Column(db.String(20), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -6,10 +6,18 @@ class Notification(db.Model):
     notification_type = db.Column(db.String(50), nullable=False)
     viewed = db.Column(db.Boolean, default=False)
     data = db.Column(db.JSON, nullable=False)  # Store additional data as JSON
+    group_key = db.Column(db.String(100), nullable=True)  # Same-target events merge into one row, e.g. "media_12"
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Events merged into this row
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp())  # Time of the latest merged event
 
     user = db.relationship('User', backref='notifications')
 
+    __table_args__ = (
+        db.Index('ix_notification_user_type_group', 'user_id', 'notification_type', 'group_key'),
+        db.Index('ix_notification_user_updated_at', 'user_id', 'updated_at'),  # Per-user listing and pruning
+    )
+
     # Define notification types as class constants
     FRIEND_REQUEST = 'friend_request'
     FRIEND_REQUEST_ACCEPTED = 'friend_request_accepted'
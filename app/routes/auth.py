@@ -4,8 +4,8 @@ from app.models.user import User
 from app.models.profile import Profile
 from app import db
 from app.config import Config
-from app.models.console import PlayStation, Xbox, Steam, Nintendo
 from app.utils.error_handler import handle_route_errors
+from app.utils.account_deletion import delete_account_data, is_heavy_account, schedule_account_deletion
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -112,31 +112,12 @@ def delete_account():
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # Delete associated profile
-    profile = Profile.query.filter_by(user_id=user_id).first()
-    if profile:
-        db.session.delete(profile)
+    # Heavy accounts are deleted in committed batches on a background task
+    if is_heavy_account(user.id, current_app.config['ACCOUNT_DELETE_BATCH_THRESHOLD']):
+        schedule_account_deletion(user.id)
+        return jsonify({"message": "Account deletion started"}), 202
     
-    # Delete associated console accounts
-    playstation = PlayStation.query.filter_by(user_id=user_id).first()
-    if playstation:
-        db.session.delete(playstation)
-        
-    xbox = Xbox.query.filter_by(user_id=user_id).first()
-    if xbox:
-        db.session.delete(xbox)
-        
-    steam = Steam.query.filter_by(user_id=user_id).first()
-    if steam:
-        db.session.delete(steam)
-        
-    nintendo = Nintendo.query.filter_by(user_id=user_id).first()
-    if nintendo:
-        db.session.delete(nintendo)
-    
-    # Delete the user
-    db.session.delete(user)
-    db.session.commit()
+    delete_account_data(user.id)
     
     return jsonify({"message": "Account deleted successfully"}), 200
 
@@ -1,9 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, session
+from flask_socketio import join_room
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import Integer, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager
 from app import db, socketio
 from app.models.user import User
-from app.models.chat import ChatRoom, ChatMessage, UserChatAssociation
+from app.models.chat import ChatRoom, ChatMessage, UserChatAssociation, ChatRoomRemoval
+from app.models.notification import Notification
+from app.routes.notifications import send_notifications
 from app.utils.error_handler import handle_route_errors
+from app.utils.outbox import stage_after_commit
+from app.utils.presence import online_users
+from app.utils.debounce import Debouncer
+from app.utils.chat_archive import read_archived_messages
+from app.utils.search import search_messages, MAX_QUERY_LENGTH as MAX_SEARCH_QUERY_LENGTH
+from app.utils.room_members import room_members, invalidate_room_members, room_channel, sync_room_channel
+from app.utils.replica import replica_reads
+from app.utils.query_stats import query_budget
 
 bp = Blueprint('chat', __name__, url_prefix='/api/chat')
 
@@ -26,18 +40,73 @@ def format_time_passed(timestamp):
         days = int(time_diff.total_seconds() // 86400)
         return f"{days} days ago" 
     
+_typing_throttle = None
+
+def _get_typing_throttle():
+    global _typing_throttle
+    if _typing_throttle is None:
+        _typing_throttle = Debouncer(current_app.config['CHAT_TYPING_THROTTLE'])
+    return _typing_throttle
+
 # SocketIO event handlers for chat
 @socketio.on('typing')
 def handle_typing(data):
-    current_app.logger.info(f"Typing event received: {data}")
-    user_id = data.get('user_id')
-    room_id = data.get('room_id')
-    participants = data.get('participants')
-
-    for participant in participants:
-        current_app.logger.info(f"Emitting typing event to user {participant}")
-        socketio.emit('user_typing', {'username': participant['username'], 'room_id': room_id},
-                       room=f"user_{participant['id']}")
+    # Sender and membership come from the server, never from the payload
+    user_id = session.get('user_id')
+    room_id = data.get('room_id') if isinstance(data, dict) else None
+    if user_id is None or room_id is None:
+        return
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return
+    if user_id not in room_members(room_id):
+        return
+
+    # One emit per room channel, at most once per throttle window per user and room
+    _get_typing_throttle().submit(
+        (user_id, room_id), socketio.emit, 'user_typing',
+        {'user_id': user_id, 'username': session.get('username'), 'room_id': room_id},
+        room=room_channel(room_id), skip_sid=request.sid
+    )
+
+@socketio.on('join_chat')
+def handle_join_chat(data):
+    # Sent by clients after `chat_rooms_changed` so sockets on other workers pick up new rooms
+    user_id = session.get('user_id')
+    room_id = data.get('room_id') if isinstance(data, dict) else None
+    if user_id is None or room_id is None:
+        return
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return
+    invalidate_room_members(room_id)
+    if user_id in room_members(room_id):
+        join_room(room_channel(room_id))
+
+def _parse_user_ids(data):
+    """Return (set of user ids, error) from a request's `user_ids` list."""
+    user_ids = data.get('user_ids', []) if isinstance(data, dict) else None
+    if not isinstance(user_ids, list):
+        return None, "user_ids must be a list of user IDs."
+    try:
+        user_ids = {int(member_id) for member_id in user_ids}
+    except (TypeError, ValueError):
+        return None, "user_ids must be a list of user IDs."
+    if len(user_ids) > current_app.config['CHAT_MEMBERS_BATCH_LIMIT']:
+        return None, f"At most {current_app.config['CHAT_MEMBERS_BATCH_LIMIT']} users per request."
+    return user_ids, None
+
+def _unknown_user_ids(user_ids):
+    # One IN query validates the whole batch
+    found = {found_id for (found_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    return sorted(user_ids - found)
+
+def _insert_memberships(room_id, user_ids):
+    if user_ids:
+        db.session.execute(insert(UserChatAssociation),
+                           [{"user_id": member_id, "chat_room_id": room_id} for member_id in sorted(user_ids)])
 
 # Route to create a chat room
 @bp.route('/create-room', methods=['POST'])
@@ -49,90 +118,264 @@ def create_chat_room():
 
     # Check if it's a group chat or 1-to-1
     is_group = data.get('is_group', False)
-    user_ids = data.get('user_ids', [])
+    user_ids, error = _parse_user_ids(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    if is_group:
-        if user_id not in user_ids:
-            user_ids.append(int(user_id))
-    else:
+    dm_key = None
+    if not is_group:
+        user_ids.discard(int(user_id))
         if len(user_ids) != 1:
-            return jsonify({"error": "For 1-to-1 chat, provide exactly one user ID."}), 400
-        user_ids.append(int(user_id))
+            return jsonify({"error": "For 1-to-1 chat, provide exactly one other user ID."}), 400
+        dm_key = ChatRoom.direct_key(user_id, next(iter(user_ids)))
 
-    current_app.logger.info(f"User IDs: {user_ids}")
+        # Reuse the pair's existing room instead of opening a second one
+        existing = ChatRoom.query.filter_by(dm_key=dm_key).first()
+        if existing:
+            return jsonify({"room_id": existing.id}), 200
+    user_ids.add(int(user_id))
 
-    chat_room = ChatRoom(name=data.get('name'), is_group=is_group, user_ids=user_ids)
-    db.session.add(chat_room)
-    db.session.commit()
-    
-    current_app.logger.info(f"Chat room created: {chat_room.id}")
-    
-    for user_id in user_ids:
-        user_chat_association = UserChatAssociation(user_id=user_id, chat_room_id=chat_room.id)
-        db.session.add(user_chat_association)
+    unknown = _unknown_user_ids(user_ids)
+    if unknown:
+        return jsonify({"error": "Unknown user IDs.", "user_ids": unknown}), 400
 
+    chat_room = ChatRoom(name=data.get('name'), is_group=is_group, dm_key=dm_key)
+    try:
+        with db.session.begin_nested():
+            db.session.add(chat_room)
+    except IntegrityError:
+        # Another request opened this pair's room first
+        existing = ChatRoom.query.filter_by(dm_key=dm_key).first()
+        return jsonify({"room_id": existing.id}), 200
+
+    _insert_memberships(chat_room.id, user_ids)
+
+    stage_after_commit(sync_room_channel, chat_room.id, added=sorted(user_ids))
     db.session.commit()
+    invalidate_room_members(chat_room.id)
+    current_app.logger.info(f"Chat room created: {chat_room.id} with {len(user_ids)} members")
     return jsonify({"room_id": chat_room.id}), 201
 
-# Route to send a chat message
-@bp.route('/send-message', methods=['POST'])
+def _group_room_for_member(room_id, user_id):
+    """Return (room, error response) for a group room the user belongs to."""
+    room = ChatRoom.query.get(room_id)
+    if not room or int(user_id) not in room_members(room_id):
+        return None, (jsonify({"error": "User is not part of this chat room."}), 403)
+    if not room.is_group:
+        return None, (jsonify({"error": "Members can only be changed in group chats."}), 400)
+    return room, None
+
+# Route to add members to a group chat
+@bp.route('/rooms/<int:room_id>/members', methods=['POST'])
 @jwt_required()
-def send_message():
+@handle_route_errors
+def add_room_members(room_id):
     user_id = get_jwt_identity()
-    data = request.json
-    
+    _, error_response = _group_room_for_member(room_id, user_id)
+    if error_response:
+        return error_response
+
+    user_ids, error = _parse_user_ids(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    unknown = _unknown_user_ids(user_ids)
+    if unknown:
+        return jsonify({"error": "Unknown user IDs.", "user_ids": unknown}), 400
+
+    existing = {member_id for (member_id,) in db.session.query(UserChatAssociation.user_id).filter(
+        UserChatAssociation.chat_room_id == room_id,
+        UserChatAssociation.user_id.in_(user_ids)
+    )}
+    added = sorted(user_ids - existing)
+    _insert_memberships(room_id, added)
+
+    stage_after_commit(sync_room_channel, room_id, added=added)
+    db.session.commit()
+    invalidate_room_members(room_id)
+    return jsonify({"added": added}), 200
+
+# Route to remove members from a group chat
+@bp.route('/rooms/<int:room_id>/members', methods=['DELETE'])
+@jwt_required()
+@handle_route_errors
+def remove_room_members(room_id):
+    user_id = get_jwt_identity()
+    _, error_response = _group_room_for_member(room_id, user_id)
+    if error_response:
+        return error_response
+
+    user_ids, error = _parse_user_ids(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+
+    removed = sorted(member_id for (member_id,) in db.session.query(UserChatAssociation.user_id).filter(
+        UserChatAssociation.chat_room_id == room_id,
+        UserChatAssociation.user_id.in_(user_ids)
+    ))
+    if removed:
+        db.session.execute(delete(UserChatAssociation).where(
+            UserChatAssociation.chat_room_id == room_id,
+            UserChatAssociation.user_id.in_(removed)
+        ).execution_options(synchronize_session=False))
+        ChatRoomRemoval.record(room_id, removed)
+
+    stage_after_commit(sync_room_channel, room_id, removed=removed)
+    db.session.commit()
+    invalidate_room_members(room_id)
+    return jsonify({"removed": removed}), 200
+
+MAX_CLIENT_MSG_ID_LENGTH = 64
+
+def _parse_message(data):
+    """Return (room_id, content, client_msg_id, error) from a send payload."""
+    if not isinstance(data, dict):
+        return None, None, None, "Room ID and content are required"
     room_id = data.get('room_id')
     content = data.get('content')
+    client_msg_id = data.get('client_msg_id')
 
     if not room_id or not content:
-        return jsonify({"error": "Room ID and content are required"}), 400
-
+        return None, None, None, "Room ID and content are required"
     try:
-        # Create a new chat message
-        chat_message = ChatMessage(room_id=room_id, sender_id=user_id, content=content)
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return None, None, None, "Invalid room ID"
+    if client_msg_id is not None and (not isinstance(client_msg_id, str)
+                                      or not 0 < len(client_msg_id) <= MAX_CLIENT_MSG_ID_LENGTH):
+        return None, None, None, f"client_msg_id must be a string of at most {MAX_CLIENT_MSG_ID_LENGTH} characters"
+    return room_id, content, client_msg_id, None
+
+def _message_payload(message, sender_name):
+    return {
+        "id": int(message.id),
+        "room_id": int(message.room_id),
+        "sender_id": int(message.sender_id),
+        "sender_name": sender_name,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+        "client_msg_id": message.client_msg_id
+    }
+
+def _create_message(user_id, sender_name, room_id, content, client_msg_id=None):
+    """Store a chat message and stage its delivery. The caller commits.
+
+    Returns (payload, created). When the sender already used `client_msg_id`,
+    nothing is written and the original message comes back with created
+    False, so clients can safely retry a send whose ack they never got.
+    """
+    if client_msg_id:
+        # Checked up front too: on a partitioned table the unique key also holds the timestamp,
+        # so on Postgres concurrent retries of one message take turns until the first commits
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(select(func.pg_advisory_xact_lock(cast(user_id, Integer),
+                                                                 func.hashtext(client_msg_id))))
+        existing = ChatMessage.query.filter_by(sender_id=user_id, client_msg_id=client_msg_id).first()
+        if existing:
+            return _message_payload(existing, sender_name), False
+
+    chat_message = ChatMessage(room_id=room_id, sender_id=user_id, content=content,
+                               client_msg_id=client_msg_id)
+    if client_msg_id:
+        try:
+            with db.session.begin_nested():
+                db.session.add(chat_message)
+        except IntegrityError:
+            existing = ChatMessage.query.filter_by(sender_id=user_id, client_msg_id=client_msg_id).first()
+            return _message_payload(existing, sender_name), False
+    else:
         db.session.add(chat_message)
 
-        # Update sender's last_read_at
-        user_assoc = UserChatAssociation.query.filter_by(
-            user_id=user_id,
-            chat_room_id=room_id
-        ).first()
-        user_assoc.last_read_at = db.func.current_timestamp()
+    # Update sender's last_read_at
+    UserChatAssociation.query.filter_by(user_id=user_id, chat_room_id=room_id)\
+        .update({UserChatAssociation.last_read_at: db.func.current_timestamp()}, synchronize_session=False)
+
+    # Update the last message and timestamp in the chat room
+    ChatMessage.update_last_message(room_id, content)
+    db.session.flush()  # Assigns the message id for the payload
+
+    message_data = _message_payload(chat_message, sender_name)
+
+    # One emit reaches every connected member through the room's channel
+    stage_after_commit(socketio.emit, 'chat_message', message_data, room=room_channel(room_id))
+
+    # Members without a live socket get a notification instead
+    members = room_members(room_id)
+    online = online_users(members)
+    offline = [member_id for member_id in members if member_id not in online and member_id != int(user_id)]
+    send_notifications(offline, Notification.MESSAGE, {
+        "room_id": int(room_id),
+        "sender_id": int(user_id),
+        "sender_name": sender_name,
+        "message_id": int(chat_message.id)
+    }, group_key=f"room_{room_id}")
+
+    return message_data, True
+
+@socketio.on('send_message')
+def handle_send_message(data):
+    """Send a message over the already-authenticated socket. The return value is the client's ack."""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return {"ok": False, "error": "Not authenticated"}
+
+    room_id, content, client_msg_id, error = _parse_message(data)
+    if error:
+        return {"ok": False, "error": error}
+    if user_id not in room_members(room_id):
+        return {"ok": False, "error": "User is not part of this chat room."}
 
-        # Update the last message and timestamp in the chat room
-        ChatMessage.update_last_message(room_id, content)
+    try:
+        message_data, created = _create_message(user_id, session.get('username'), room_id, content, client_msg_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error sending message: {str(e)}")
+        return {"ok": False, "error": "Failed to send message"}
 
-        # Get the sender's username and chat room
-        sender = User.query.get(user_id)
-        chat_room = ChatRoom.query.get(room_id)
+    return {"ok": True, "message": message_data, "duplicate": not created}
 
-        db.session.commit()
+# Route to send a chat message, kept for clients without a socket
+@bp.route('/send-message', methods=['POST'])
+@jwt_required()
+def send_message():
+    user_id = int(get_jwt_identity())
 
-        # Emit the message to all users in the chat room
-        message_data = {
-            "id": int(chat_message.id),
-            "room_id": int(room_id),
-            "sender_id": int(user_id),
-            "sender_name": sender.username,
-            "content": content,
-            "timestamp": chat_message.timestamp.isoformat()
-        }
+    room_id, content, client_msg_id, error = _parse_message(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    if user_id not in room_members(room_id):
+        return jsonify({"error": "User is not part of this chat room."}), 403
 
-        # Emit to all users in the chat room
-        for room_user_id in chat_room.user_ids:
-            socketio.emit('chat_message', message_data, room=f"user_{room_user_id}")
+    try:
+        sender = User.query.get(user_id)
+        message_data, created = _create_message(user_id, sender.username, room_id, content, client_msg_id)
+        db.session.commit()
 
-        return jsonify({"message_id": chat_message.id}), 201
+        return jsonify({"message_id": message_data["id"], "duplicate": not created}), 201 if created else 200
 
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error sending message: {str(e)}")
         return jsonify({"error": "Failed to send message"}), 500
 
+MAX_MESSAGES_PAGE = 100
+
+def _sender_names(sender_ids):
+    if not sender_ids:
+        return {}
+    return dict(db.session.query(User.id, User.username).filter(User.id.in_(set(sender_ids))))
+
 # Route to view chat messages
 @bp.route('/messages/<int:room_id>', methods=['GET'])
 @jwt_required()
+@query_budget(6)
 def get_messages(room_id):
+    """Return a room's messages, oldest first.
+
+    Without `limit` or `before` this is the whole history still in the
+    database. With them it is one page ending just before message `before`;
+    once the database runs out, older pages come from the archive files.
+    """
     user_id = get_jwt_identity()
     
     # Mark messages as read when fetching them
@@ -140,16 +383,52 @@ def get_messages(room_id):
         user_id=user_id,
         chat_room_id=room_id
     ).first()
+    if not user_assoc:
+        return jsonify({"error": "User is not part of this chat room."}), 403
     user_assoc.last_read_at = db.func.current_timestamp()
     db.session.commit()
-    
-    messages = ChatMessage.query.filter_by(room_id=room_id).order_by(ChatMessage.timestamp.asc()).all()
-    room = ChatRoom.query.get(room_id)
 
+    room = ChatRoom.query.get(room_id)
+    limit = request.args.get('limit', type=int)
+    before = request.args.get('before', type=int)
+    paged = limit is not None or before is not None
+
+    query = ChatMessage.query.filter_by(room_id=room_id)
+    archived = []
+    has_more = False
+    if not paged:
+        messages = query.order_by(ChatMessage.timestamp.asc()).all()
+    else:
+        limit = min(max(limit or 50, 1), MAX_MESSAGES_PAGE)
+        if before is not None:
+            query = query.filter(ChatMessage.id < before)
+        messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit][::-1]
+
+        # Older history than the table holds lives in the archive
+        needed = limit - len(messages)
+        if needed:
+            archived = read_archived_messages(
+                current_app.config['CHAT_ARCHIVE_FOLDER'], room_id,
+                before_id=messages[0].id if messages else before,
+                limit=needed + 1
+            )
+            has_more = len(archived) > needed
+            archived = archived[-needed:]
+
+    names = _sender_names([row['sender_id'] for row in archived] + [message.sender_id for message in messages])
     room_messages = [{
+        "id": row['id'],
+        "sender_id": row['sender_id'],
+        "sender_name": names.get(row['sender_id']),
+        "content": row['content'],
+        "timestamp": row['timestamp'],
+        "archived": True
+    } for row in archived] + [{
         "id": message.id,
         "sender_id": message.sender_id,
-        "sender_name": User.query.get(message.sender_id).username,
+        "sender_name": names.get(message.sender_id),
         "content": message.content,
         "timestamp": message.timestamp
     } for message in messages]
@@ -159,50 +438,266 @@ def get_messages(room_id):
         UserChatAssociation.user_id != user_id
     ).first().username
 
-    return jsonify({
+    result = {
         "room_name": room_name,
         "messages": room_messages
-    }), 200
+    }
+    if paged:
+        result["has_more"] = has_more
+        result["next_cursor"] = room_messages[0]["id"] if room_messages and has_more else None
+    return jsonify(result), 200
+
+def _room_summaries(user_id, chat_associations):
+    """Build the room list entries for a user's associations with a fixed number of queries."""
+    rooms = {assoc.chat_room_id: assoc.chat_room for assoc in chat_associations}
+    if not rooms:
+        return []
+
+    # Unread counts for every room in one grouped query
+    unread_counts = dict(db.session.query(ChatMessage.room_id, db.func.count(ChatMessage.id))
+        .join(UserChatAssociation, db.and_(
+            UserChatAssociation.chat_room_id == ChatMessage.room_id,
+            UserChatAssociation.user_id == user_id
+        ))
+        .join(ChatRoom, ChatRoom.id == ChatMessage.room_id)
+        .filter(
+            ChatMessage.room_id.in_(rooms),
+            ChatMessage.timestamp > db.func.coalesce(UserChatAssociation.last_read_at, ChatRoom.created_at)
+        )
+        .group_by(ChatMessage.room_id))
+
+    # 1-to-1 rooms are named after the other participant
+    direct_room_ids = [room_id for room_id, room in rooms.items() if not room.is_group]
+    other_names = {}
+    if direct_room_ids:
+        other_names = dict(db.session.query(UserChatAssociation.chat_room_id, User.username)
+            .join(User, User.id == UserChatAssociation.user_id)
+            .filter(
+                UserChatAssociation.chat_room_id.in_(direct_room_ids),
+                UserChatAssociation.user_id != user_id
+            ))
+
+    results = []
+    for assoc in chat_associations:
+        room = assoc.chat_room
+        last_message_time = room.last_message_timestamp if room.last_message_timestamp else room.created_at
+        results.append({
+            "id": room.id,
+            "name": room.name if room.is_group else other_names.get(room.id),
+            "is_group": room.is_group,
+            "lastMessage": room.last_message if room.last_message else "No messages yet",
+            "timestamp": format_time_passed(last_message_time),
+            "unread_count": unread_counts.get(room.id, 0)
+        })
+    return results
 
 # Route to retrieve all chat rooms for the current user
 @bp.route('/my-rooms', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(3)
 def get_my_rooms():
     user_id = get_jwt_identity()
     
     # Get all chat rooms for the current user, ordered by last message timestamp
     chat_associations = (UserChatAssociation.query
         .join(ChatRoom)
+        .options(contains_eager(UserChatAssociation.chat_room))
         .filter(UserChatAssociation.user_id == user_id)
         .order_by(ChatRoom.last_message_timestamp.desc().nullslast())  # nullslast() puts rooms with no messages at the end
         .all())
-    
-    results = []
 
-    for assoc in chat_associations:
-        room = assoc.chat_room
-        last_message_time = room.last_message_timestamp if room.last_message_timestamp else room.created_at
-        time_passed = format_time_passed(last_message_time)
-
-        # Count unread messages
-        unread_count = ChatMessage.query.filter(
-            ChatMessage.room_id == room.id,
-            ChatMessage.timestamp > (assoc.last_read_at or room.created_at)
-        ).count()
-        
-        results.append({
-            "id": room.id,
-            "name": room.name if room.is_group else User.query.join(UserChatAssociation).filter(
-                UserChatAssociation.chat_room_id == room.id,
-                UserChatAssociation.user_id != user_id
-            ).first().username,
-            "is_group": room.is_group,
-            "lastMessage": room.last_message if room.last_message else "No messages yet",
-            "timestamp": time_passed,
-            "unread_count": unread_count
-        })
+    return jsonify({"rooms": _room_summaries(user_id, chat_associations)}), 200
+
+SYNC_SEQUENCES = (ChatMessage, UserChatAssociation, ChatRoomRemoval)  # The order of the cursor's parts
+
+def _parse_sync_cursor(cursor, max_gaps):
+    """Parse "<message id>:<room membership id>:<room removal id>[:<gaps>:<gaps>:<gaps>]".
+
+    The ids are high-water marks of what the client has seen. Each optional
+    gap list holds comma-separated ids below its mark whose rows hadn't
+    committed yet, at most `max_gaps` of them. Cursors from before removals
+    were reported have only two parts and read removals from the start.
+    Returns (marks, gaps), both tuples in SYNC_SEQUENCES order.
+    """
+    parts = cursor.split(':')
+    if len(parts) == 2:
+        parts.append('0')
+    if len(parts) == 3:
+        parts += ['', '', '']
+    if len(parts) != 6:
+        raise ValueError(cursor)
+    marks = tuple(int(part) for part in parts[:3])
+    gaps = tuple(tuple(int(gap) for gap in part.split(',')) if part else () for part in parts[3:])
+    for mark, ids in zip(marks, gaps):
+        if mark < 0 or len(ids) > max_gaps or any(not 0 < gap < mark for gap in ids):
+            raise ValueError(cursor)
+    return marks, gaps
+
+def _format_sync_cursor(marks, gaps):
+    cursor = ':'.join(str(mark) for mark in marks)
+    if any(gaps):
+        cursor += ':' + ':'.join(','.join(str(gap) for gap in ids) for ids in gaps)
+    return cursor
+
+def _sync_gaps(user_id, room_ids, previous_marks, marks, previous_gaps, seen, rescan):
+    """Ids up to `rescan` below each new mark whose rows the client may not have yet.
+
+    Ids are handed out when a row is inserted, not when it commits, so a row
+    can become visible after a later id was already synced. An id stays a
+    gap while no committed row holds it, or while its row is the user's but
+    not in `seen` (the ids this call returned, per table; None when the
+    marks came from reading those rows). All tables are checked in one
+    query. Ids that fall further than `rescan` below the mark are given up:
+    their transaction rolled back, or the row was deleted.
+    """
+    owned = (ChatMessage.room_id.in_(room_ids), UserChatAssociation.user_id == user_id,
+             ChatRoomRemoval.user_id == user_id)
+    candidates, selects = [], []
+    for model, is_mine, since, mark, gaps in zip(SYNC_SEQUENCES, owned, previous_marks, marks, previous_gaps):
+        low = max(since, mark - rescan)
+        kept = [gap for gap in gaps if gap > mark - rescan]
+        candidates.append(kept + list(range(low + 1, mark + 1)))
+        if candidates[-1]:
+            selects.append(select(literal(model.__tablename__), model.id, is_mine)
+                           .where(db.or_(model.id.in_(kept), db.and_(model.id > low, model.id <= mark))))
+    found = {}
+    if selects:
+        rows = db.session.execute(selects[0] if len(selects) == 1 else union_all(*selects))
+        found = {(table, row_id): bool(mine) for table, row_id, mine in rows}
+    gaps = []
+    for model, ids, seen_ids in zip(SYNC_SEQUENCES, candidates, seen or [None] * len(SYNC_SEQUENCES)):
+        table = model.__tablename__
+        gaps.append(tuple(sorted(
+            row_id for row_id in ids
+            if (table, row_id) not in found or (found[table, row_id] and seen_ids is not None
+                                                and row_id not in seen_ids)
+        )))
+    return tuple(gaps)
+
+# Route for reconnecting clients to catch up on what they missed
+@bp.route('/sync', methods=['GET'])
+@jwt_required()
+@query_budget(6)
+def sync():
+    """Return the rooms and messages that changed since `since`, plus the cursor to use next time.
+
+    Without `since` only the current cursor is returned, for clients that
+    just loaded the full room list. Messages come oldest first, at most
+    CHAT_SYNC_MESSAGE_LIMIT new ones per call; `has_more` means call again
+    with the returned cursor. `removed_room_ids` lists rooms the user has
+    left or been removed from.
+
+    Besides what lies above its marks, the cursor names the ids below them
+    that were still uncommitted (see _sync_gaps), and only those are read
+    again, so a client that is caught up gets an empty response.
+    """
+    user_id = int(get_jwt_identity())
+    since = request.args.get('since')
+    limit = current_app.config['CHAT_SYNC_MESSAGE_LIMIT']
+    rescan = current_app.config['CHAT_SYNC_RESCAN_IDS']
+
+    chat_associations = (UserChatAssociation.query
+        .join(ChatRoom)
+        .options(contains_eager(UserChatAssociation.chat_room))
+        .filter(UserChatAssociation.user_id == user_id)
+        .order_by(ChatRoom.last_message_timestamp.desc().nullslast())
+        .all())
+    room_ids = [assoc.chat_room_id for assoc in chat_associations]
+    latest_assoc_id = max((assoc.id for assoc in chat_associations), default=0)
+
+    if since is None:
+        latest_message_id = db.session.query(db.func.max(ChatMessage.id))\
+            .filter(ChatMessage.room_id.in_(room_ids)).scalar() if room_ids else None
+        latest_removal_id = db.session.query(db.func.max(ChatRoomRemoval.id))\
+            .filter(ChatRoomRemoval.user_id == user_id).scalar()
+        marks = (latest_message_id or 0, latest_assoc_id, latest_removal_id or 0)
+        return jsonify({
+            "cursor": _format_sync_cursor(marks, _sync_gaps(user_id, room_ids, (0, 0, 0), marks,
+                                                            ((), (), ()), None, rescan)),
+            "rooms": [],
+            "removed_room_ids": [],
+            "messages": [],
+            "has_more": False
+        }), 200
+
+    try:
+        (since_message_id, since_assoc_id, since_removal_id), gaps = _parse_sync_cursor(since, rescan)
+    except ValueError:
+        return jsonify({"error": "Invalid sync cursor"}), 400
+    message_gaps, assoc_gaps, removal_gaps = gaps
+
+    rows = []
+    if room_ids:
+        # Gap ids sort first and number at most `rescan`, so `limit` new ones always fit
+        rows = (db.session.query(ChatMessage, User.username)
+            .join(User, User.id == ChatMessage.sender_id)
+            .filter(ChatMessage.room_id.in_(room_ids),
+                    db.or_(ChatMessage.id > since_message_id, ChatMessage.id.in_(message_gaps)))
+            .order_by(ChatMessage.id.asc())
+            .limit(len(message_gaps) + limit + 1)
+            .all())
+    filled = [row for row in rows if row[0].id <= since_message_id]
+    new_rows = rows[len(filled):]
+    has_more = len(new_rows) > limit
+    rows = filled + new_rows[:limit]
+
+    # Rooms with new messages, and rooms the user joined since the cursor
+    changed_room_ids = {message.room_id for message, _ in rows}
+    changed_room_ids.update(assoc.chat_room_id for assoc in chat_associations
+                            if assoc.id > since_assoc_id or assoc.id in assoc_gaps)
+    changed = [assoc for assoc in chat_associations if assoc.chat_room_id in changed_room_ids]
+
+    removals = (db.session.query(ChatRoomRemoval.id, ChatRoomRemoval.chat_room_id)
+        .filter(ChatRoomRemoval.user_id == user_id,
+                db.or_(ChatRoomRemoval.id > since_removal_id, ChatRoomRemoval.id.in_(removal_gaps)))
+        .all())
+    # A room the user was added back to is reported under rooms instead
+    removed_room_ids = sorted({room_id for _, room_id in removals} - set(room_ids))
+
+    marks = (since_message_id, since_assoc_id, since_removal_id)
+    seen = ({message.id for message, _ in rows}, {assoc.id for assoc in chat_associations},
+            {removal_id for removal_id, _ in removals})
+    next_marks = (max(since_message_id, rows[-1][0].id if rows else 0),
+                  max(since_assoc_id, latest_assoc_id),
+                  max([since_removal_id] + [removal_id for removal_id, _ in removals]))
+    return jsonify({
+        "cursor": _format_sync_cursor(next_marks, _sync_gaps(user_id, room_ids, marks, next_marks, gaps, seen,
+                                                             rescan)),
+        "rooms": _room_summaries(user_id, changed),
+        "removed_room_ids": removed_room_ids,
+        "messages": [_message_payload(message, username) for message, username in rows],
+        "has_more": has_more
+    }), 200
+
+MAX_SEARCH_PAGE = 50
 
-    return jsonify({"rooms": results}), 200
+# Route to search messages across the user's chat rooms
+@bp.route('/search', methods=['GET'])
+@jwt_required()
+@replica_reads
+def search_chat_messages():
+    user_id = int(get_jwt_identity())
+    query_text = (request.args.get('q') or '').strip()
+    if not query_text or len(query_text) > MAX_SEARCH_QUERY_LENGTH:
+        return jsonify({"error": f"q is required and at most {MAX_SEARCH_QUERY_LENGTH} characters"}), 400
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_SEARCH_PAGE)
+    rows = search_messages(
+        user_id, query_text,
+        room_id=request.args.get('room_id', type=int),
+        before=request.args.get('before', type=int),
+        limit=limit + 1
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    results = [_message_payload(message, username) for message, username in rows]
+    return jsonify({
+        "messages": results,
+        "has_more": has_more,
+        "next_cursor": results[-1]["id"] if has_more else None
+    }), 200
 
 @bp.route('/mark-all-read/<int:room_id>', methods=['POST'])
 @jwt_required()
@@ -221,7 +716,7 @@ def mark_all_read(room_id):
     # Update the last_read_at timestamp to the current time
     user_assoc.last_read_at = db.func.current_timestamp()
     
-    socketio.emit('mark_all_read', room=f"user_{user_id}")
+    stage_after_commit(socketio.emit, 'mark_all_read', room=f"user_{user_id}")
     
     try:
         db.session.commit()
@@ -233,6 +728,7 @@ def mark_all_read(room_id):
 
 @bp.route('/participants/<int:room_id>', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_chat_room_participants(room_id):
     user_id = get_jwt_identity()
     
@@ -6,6 +6,7 @@ from app.models.user import User
 from app.routes.notifications import send_notification
 from app.models.notification import Notification
 from app.utils.error_handler import handle_route_errors
+from app.utils.replica import replica_reads
 
 bp = Blueprint('friendship', __name__, url_prefix='/api/friends')
 
@@ -41,13 +42,13 @@ def send_friend_request():
         
     friendship = Friendship(user_id=user_id, friend_id=friend.id)
     db.session.add(friendship)
-    db.session.commit()
-    
-    current_app.logger.debug(f'Friend request sent successfully to {friend_username}')
     send_notification(friend.id, Notification.FRIEND_REQUEST, {
         'sender_id': user_id,
         'sender_username': user.username
     })
+    db.session.commit()
+    
+    current_app.logger.debug(f'Friend request sent successfully to {friend_username}')
     return jsonify({"message": "Friend request sent"}), 201
 
 @bp.route('/accept', methods=['POST'])
@@ -93,7 +94,7 @@ def accept_friend_request():
     if notif:
         db.session.delete(notif)
     
-    # Send notifications
+    # Stage notifications; they are pushed after the commit below
     send_notification(friendship.user_id, Notification.FRIEND_REQUEST_ACCEPTED, {
         'receiver_id': user_id,
         'receiver_username': User.query.get(user_id).username
@@ -156,6 +157,7 @@ def reject_friend_request():
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_friends():
     user_id = get_jwt_identity()
     current_app.logger.debug(f'Getting friends for user_id: {user_id}')
@@ -189,6 +191,7 @@ def get_friends():
 
 @bp.route('/pending', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_pending_requests():
     user_id = get_jwt_identity()
     current_app.logger.debug(f'Getting pending friend requests for user_id: {user_id}')
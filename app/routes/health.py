@@ -1,7 +1,36 @@
-from flask import Blueprint, jsonify
+import hmac
+from flask import Blueprint, current_app, jsonify, request
+from app.utils.db_pool import pool_stats
+from app.utils.metrics import render_metrics
+from app.utils.health_checks import readiness
 
 bp = Blueprint('health', __name__)
 
 @bp.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy"}), 200 
\ No newline at end of file
+    return jsonify({"status": "healthy", "db_pool": pool_stats()}), 200
+
+@bp.route('/api/health/live', methods=['GET'])
+def liveness():
+    # Only says the worker can serve requests; dependencies are readiness's job
+    return jsonify({"status": "alive"}), 200
+
+@bp.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    ready, checks, checked_at = readiness()
+    return jsonify({
+        "status": "ready" if ready else "not ready",
+        "checked_at": checked_at,
+        "checks": checks
+    }), 200 if ready else 503
+
+@bp.route('/api/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if not token and current_app.config.get('METRICS_TOKEN_REQUIRED'):
+        return jsonify({"error": "Not found"}), 404
+    supplied = request.headers.get('Authorization', '').encode()
+    if token and not hmac.compare_digest(supplied, f"Bearer {token}".encode()):
+        return jsonify({"error": "Unauthorized"}), 401
+    body, content_type = render_metrics()
+    return body, 200, {'Content-Type': content_type}
@@ -1,15 +1,45 @@
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.media import Media, Comment
+from app.models.media import Media, Comment, Reaction
 from app.models.user import User
 from app.models.friendship import Friendship
+from app.models.notification import Notification
+from app.routes.notifications import send_notification
 from app.utils.file_handler import save_file
 from app.utils.error_handler import handle_route_errors
+from app.utils.derivatives import DERIVATIVE_FOLDER, remove_derivatives
+from app.utils.media_worker import enqueue_media_processing
+from app.utils.search import search_comments, MAX_QUERY_LENGTH as MAX_SEARCH_QUERY_LENGTH
+from app.utils.reactions import add_reaction, remove_reaction, reaction_counts, viewer_reactions, delete_media_reactions
+from app.utils.replica import replica_reads
+from app.utils.metrics import UPLOAD_BYTES
+from app.utils.query_stats import query_budget
 from app import db
+from sqlalchemy.orm import joinedload
 import os
 
 bp = Blueprint('media', __name__, url_prefix='/api/media')
 
+MAX_COMMENTS_PAGE = 100
+
+def media_urls(media):
+    view_url = f"/api/media/{media.id}/view"
+    variants = {name: f"{view_url}/{name}" for name in (media.variants or {})}
+    # Images can fall back to the original; videos have no still until a poster exists
+    fallback = view_url if media.media_type == 'image' else None
+    return {
+        "view_url": view_url,
+        "thumb_url": variants.get('thumb', fallback),
+        "variants": variants
+    }
+
+def reaction_fields(media_id, counts, mine):
+    return {
+        "reactions": counts.get(media_id, {}),
+        "viewer_reactions": mine.get(media_id, []),
+        "liked": Reaction.LIKE in mine.get(media_id, [])
+    }
+
 @bp.route('/upload', methods=['POST'])
 @jwt_required()
 @handle_route_errors
@@ -23,20 +53,21 @@ def upload_media():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    # Determine file type
-    file_type = 'image' if file.content_type.startswith('image/') else 'video'
+    current_app.logger.debug(f'Uploading {file.filename} for user {user_id}')
     
-    current_app.logger.debug(f'Uploading {file_type} for user {user_id}')
-    
-    # Save file and get filename
-    filename = save_file(file, file_type)
+    # Save file and get filename; the type comes from the file's own bytes,
+    # not the client-supplied content type
+    filename, mime_type = save_file(file)
     if not filename:
         return jsonify({"error": "Invalid file type"}), 400
+    file_type = mime_type.split('/')[0]
+    UPLOAD_BYTES.labels(file_type).inc(os.path.getsize(os.path.join(current_app.config['UPLOAD_FOLDER'], filename)))
 
     # Create media record
     media = Media(
         user_id=user_id,
         media_type=file_type,
+        mime_type=mime_type,
         file_path=filename,
         storage_type='local'
     )
@@ -44,10 +75,15 @@ def upload_media():
     db.session.add(media)
     db.session.commit()
     
+    # Hashing, sniffing and derivatives happen in the worker pool; the client
+    # gets a media_processed event when they are done
+    enqueue_media_processing(media)
+    
     return jsonify({
         "message": "File uploaded successfully",
         "media_id": media.id,
-        "file_path": filename
+        "file_path": filename,
+        "processing_status": media.processing_status
     }), 201
 
 @bp.route('/<int:media_id>', methods=['GET'])
@@ -58,16 +94,22 @@ def get_media(media_id):
     
     media = Media.query.get_or_404(media_id)
     user = User.query.get(media.user_id)
+    counts = reaction_counts([media.id])
+    mine = viewer_reactions(user_id, [media.id])
     
     return jsonify({
         "created_at": media.created_at.isoformat(),
         "id": media.id,
         "media_type": media.media_type,
+        "mime_type": media.mime_type,
+        "processing_status": media.processing_status,
         "user": {
             "id": user.id,
             "username": user.username
         },
-        "view_url": f"/api/media/{media.id}/view"
+        **media_urls(media),
+        "comment_count": media.comment_count,
+        **reaction_fields(media.id, counts, mine)
     })
 
 @bp.route('/<int:media_id>', methods=['DELETE'])
@@ -84,20 +126,25 @@ def delete_media(media_id):
         current_app.logger.warning(f'Unauthorized deletion attempt of media {media_id} by user {user_id}')
         return jsonify({"error": "Unauthorized"}), 403
     
-    # Delete file from filesystem
     file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.file_path)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    variants = media.variants
     
-    # Delete database record
+    # Delete database record first so a failed commit never leaves a row without its file
+    delete_media_reactions([media.id])
     db.session.delete(media)
     db.session.commit()
     
+    # Delete files from filesystem; anything missed here is picked up by gc-uploads
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    remove_derivatives(current_app.config['UPLOAD_FOLDER'], variants)
+    
     current_app.logger.debug(f'Media {media_id} deleted successfully')
     return jsonify({"message": "Media deleted successfully"}), 200
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_all_media():
     user_id = get_jwt_identity()
     current_app.logger.debug(f'Getting all media for user {user_id}')
@@ -112,6 +159,7 @@ def get_all_media():
         media_list.append({
             "id": media.id,
             "media_type": media.media_type,
+            "processing_status": media.processing_status,
             "file_path": media.file_path,
             "created_at": media.created_at.isoformat(),
             "url": f"/api/media/{media.id}"
@@ -142,8 +190,36 @@ def view_media(media_id):
         media.file_path
     )
 
+@bp.route('/<int:media_id>/view/<variant>', methods=['GET'])
+@jwt_required()
+def view_media_variant(media_id, variant):
+    user_id = get_jwt_identity()
+    
+    media = Media.query.get_or_404(media_id)
+    
+    # Same access rule as the original file
+    if str(media.user_id) != str(user_id):
+        current_app.logger.warning(f'Unauthorized view attempt of media {media_id} by user {user_id}')
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    filename = (media.variants or {}).get(variant)
+    if not filename:
+        return jsonify({"error": "Variant not found"}), 404
+    
+    # Derivative names are unique per upload, so clients may cache them indefinitely
+    response = send_from_directory(
+        os.path.join(current_app.config['UPLOAD_FOLDER'], DERIVATIVE_FOLDER),
+        filename,
+        max_age=31536000
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 @bp.route('/feed', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(4)
 def get_media_feed():
     user_id = get_jwt_identity()
     
@@ -155,19 +231,27 @@ def get_media_feed():
     
     # Get paginated media items
     pagination = Media.query\
+        .options(joinedload(Media.user))\
         .order_by(Media.created_at.desc())\
         .paginate(page=page, per_page=per_page, error_out=False)
     
+    # Two batched lookups for the whole page instead of per-item queries
+    media_ids = [media.id for media in pagination.items]
+    counts = reaction_counts(media_ids)
+    mine = viewer_reactions(user_id, media_ids)
+    
     media_list = []
     for media in pagination.items:
         media_list.append({
             "id": media.id,
             "media_type": media.media_type,
-            "view_url": f"/api/media/{media.id}/view",
+            **media_urls(media),
+            "comment_count": media.comment_count,
+            **reaction_fields(media.id, counts, mine),
             "created_at": media.created_at.isoformat(),
             "user": {
                 "id": media.user_id,
-                "username": User.query.get(media.user_id).username
+                "username": media.user.username
             }
         })
     
@@ -201,10 +285,22 @@ def add_comment(media_id):
     )
     
     db.session.add(comment)
-    db.session.commit()
+    # Bump the counter in SQL so concurrent comments don't overwrite each other
+    Media.query.filter_by(id=media_id)\
+        .update({Media.comment_count: Media.comment_count + 1}, synchronize_session=False)
     
     user = User.query.get(user_id)
     
+    if str(media.user_id) != str(user_id):
+        send_notification(media.user_id, Notification.COMMENT, {
+            'media_id': media_id,
+            'comment_id': comment.id,
+            'sender_id': user.id,
+            'sender_username': user.username
+        }, group_key=f"media_{media_id}")
+    
+    db.session.commit()
+    
     return jsonify({
         "id": comment.id,
         "content": comment.content,
@@ -217,30 +313,77 @@ def add_comment(media_id):
 
 @bp.route('/<int:media_id>/comments', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(2)
 def get_comments(media_id):
-    Media.query.get_or_404(media_id)  # Verify media exists
+    media = Media.query.get_or_404(media_id)  # Verify media exists
+    
+    # Cursor pagination: `before` is the id of the last comment the client has
+    before = request.args.get('before', type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_COMMENTS_PAGE)
     
-    comments = Comment.query\
-        .filter_by(media_id=media_id)\
-        .order_by(Comment.created_at.desc())\
-        .all()
+    query = db.session.query(Comment, User.username)\
+        .join(User, User.id == Comment.user_id)\
+        .filter(Comment.media_id == media_id)
+    if before:
+        query = query.filter(Comment.id < before)
+    rows = query.order_by(Comment.id.desc()).limit(limit + 1).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
     comment_list = []
-    for comment in comments:
-        user = User.query.get(comment.user_id)
+    for comment, username in rows:
         comment_list.append({
             "id": comment.id,
             "content": comment.content,
             "created_at": comment.created_at.isoformat(),
             "user": {
-                "id": user.id,
-                "username": user.username
+                "id": comment.user_id,
+                "username": username
             }
         })
     
     return jsonify({
         "comments": comment_list,
-        "total": len(comment_list)
+        "total": media.comment_count,
+        "has_more": has_more,
+        "next_cursor": comment_list[-1]["id"] if has_more else None
+    })
+
+@bp.route('/comments/search', methods=['GET'])
+@jwt_required()
+@replica_reads
+def search_media_comments():
+    query_text = (request.args.get('q') or '').strip()
+    if not query_text or len(query_text) > MAX_SEARCH_QUERY_LENGTH:
+        return jsonify({"error": f"q is required and at most {MAX_SEARCH_QUERY_LENGTH} characters"}), 400
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_COMMENTS_PAGE)
+    rows = search_comments(
+        query_text,
+        media_id=request.args.get('media_id', type=int),
+        before=request.args.get('before', type=int),
+        limit=limit + 1
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    comment_list = [{
+        "id": comment.id,
+        "media_id": comment.media_id,
+        "content": comment.content,
+        "created_at": comment.created_at.isoformat(),
+        "user": {
+            "id": comment.user_id,
+            "username": username
+        }
+    } for comment, username in rows]
+
+    return jsonify({
+        "comments": comment_list,
+        "has_more": has_more,
+        "next_cursor": comment_list[-1]["id"] if has_more else None
     })
 
 @bp.route('/comments/<int:comment_id>', methods=['DELETE'])
@@ -253,12 +396,73 @@ def delete_comment(comment_id):
         return jsonify({"error": "Not authorized"}), 403
         
     db.session.delete(comment)
+    Media.query.filter_by(id=comment.media_id)\
+        .update({Media.comment_count: Media.comment_count - 1}, synchronize_session=False)
     db.session.commit()
     
     return jsonify({"message": "Comment deleted successfully"}), 200
 
+# Reaction routes
+@bp.route('/<int:media_id>/reactions', methods=['POST'])
+@jwt_required()
+@handle_route_errors
+def react_to_media(media_id):
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    reaction_type = data.get('type', Reaction.LIKE)
+    
+    if reaction_type not in Reaction.TYPES:
+        return jsonify({"error": f"Reaction type must be one of {', '.join(Reaction.TYPES)}"}), 400
+    
+    media = Media.query.get_or_404(media_id)
+    
+    created = add_reaction(user_id, media_id, reaction_type)
+    if created and media.user_id != user_id:
+        send_notification(media.user_id, Notification.LIKE, {
+            'media_id': media_id,
+            'reaction': reaction_type,
+            'sender_id': user_id,
+            'sender_username': User.query.get(user_id).username
+        }, group_key=f"media_{media_id}")
+    db.session.commit()
+    
+    return jsonify({
+        "media_id": media_id,
+        **reaction_fields(media_id, reaction_counts([media_id]), viewer_reactions(user_id, [media_id]))
+    }), 201 if created else 200
+
+@bp.route('/<int:media_id>/reactions/<reaction_type>', methods=['DELETE'])
+@jwt_required()
+@handle_route_errors
+def remove_media_reaction(media_id, reaction_type):
+    user_id = int(get_jwt_identity())
+    Media.query.get_or_404(media_id)
+    
+    if not remove_reaction(user_id, media_id, reaction_type):
+        return jsonify({"error": "Reaction not found"}), 404
+    db.session.commit()
+    
+    return jsonify({
+        "media_id": media_id,
+        **reaction_fields(media_id, reaction_counts([media_id]), viewer_reactions(user_id, [media_id]))
+    }), 200
+
+@bp.route('/<int:media_id>/reactions', methods=['GET'])
+@jwt_required()
+@replica_reads
+def get_media_reactions(media_id):
+    user_id = get_jwt_identity()
+    Media.query.get_or_404(media_id)
+    
+    return jsonify({
+        "media_id": media_id,
+        **reaction_fields(media_id, reaction_counts([media_id]), viewer_reactions(user_id, [media_id]))
+    }), 200
+
 @bp.route('/friends/feed', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(5)
 def get_friends_media_feed():
     user_id = get_jwt_identity()
     page = request.args.get('page', 1, type=int)
@@ -278,21 +482,28 @@ def get_friends_media_feed():
     
     # Get media from friends
     pagination = Media.query\
+        .options(joinedload(Media.user))\
         .filter(Media.user_id.in_(friend_ids))\
         .order_by(Media.created_at.desc())\
         .paginate(page=page, per_page=per_page, error_out=False)
     
+    # Two batched lookups for the whole page instead of per-item queries
+    media_ids = [media.id for media in pagination.items]
+    counts = reaction_counts(media_ids)
+    mine = viewer_reactions(user_id, media_ids)
+    
     media_list = []
     for media in pagination.items:
-        user = User.query.get(media.user_id)
         media_list.append({
             "id": media.id,
             "media_type": media.media_type,
-            "view_url": f"/api/media/{media.id}/view",
+            **media_urls(media),
+            "comment_count": media.comment_count,
+            **reaction_fields(media.id, counts, mine),
             "created_at": media.created_at.isoformat(),
             "user": {
-                "id": user.id,
-                "username": user.username
+                "id": media.user.id,
+                "username": media.user.username
             }
         })
     
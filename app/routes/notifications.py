@@ -1,10 +1,19 @@
-from flask import Blueprint, request, current_app, jsonify
+from flask import Blueprint, request, current_app, jsonify, session
 from flask_socketio import emit, join_room
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from app import socketio, db
 from app.models.user import User
 from app.models.notification import Notification
 from app.utils.error_handler import handle_route_errors
+from app.utils.debounce import Debouncer
+from app.utils.outbox import stage_after_commit
+from app.utils.presence import user_connected, user_disconnected
+from app.utils.room_members import user_room_ids, room_channel
+from app.utils.replica import replica_reads
+from app.utils.metrics import SOCKET_CONNECTIONS
+from app.utils.query_stats import query_budget
+from sqlalchemy import insert, update
+from datetime import datetime, timedelta, UTC
 
 bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
@@ -17,43 +26,128 @@ def handle_connect():
         
         # Create a private room for this user
         join_room(f"user_{user_id}")
+        # And join a channel per chat room for room-wide events like typing
+        for room_id in user_room_ids(user_id):
+            join_room(room_channel(room_id))
+
+        # Remember who this socket belongs to for later events
+        user = User.query.get(user_id)
+        session['user_id'] = int(user_id)
+        session['username'] = user.username if user else None
+        user_connected(user_id, request.sid)
+        SOCKET_CONNECTIONS.inc()
+        session['counted'] = True  # Disconnect undoes the inc only if it happened
         current_app.logger.info(f"User {user_id} connected to websocket")
         return True
     except Exception as e:
         current_app.logger.error(f"WebSocket connection error: {str(e)}")
         return False  # Reject the connection
 
-# Function to send notification and save it to the database
-def send_notification(user_id, notification_type, data):
-    # Create a new notification instance
-    notification = Notification(
-        user_id=user_id,
-        notification_type=notification_type,
-        data=data
-    )
-    
-    # Save the notification to the database
-    db.session.add(notification)
-    db.session.commit()
-    
-    # Emit the notification to the user's WebSocket room
-    socketio.emit('notification', {
-        'type': notification_type,
-        'data': data
-    }, room=f"user_{user_id}")
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    user_disconnected(request.sid)
+    if session.pop('counted', False):
+        SOCKET_CONNECTIONS.dec()
+
+_emit_debouncer = None
+
+def _get_emit_debouncer():
+    global _emit_debouncer
+    if _emit_debouncer is None:
+        _emit_debouncer = Debouncer(current_app.config['NOTIFICATION_EMIT_DEBOUNCE'])
+    return _emit_debouncer
+
+def _push_notification(user_id, notification_type, group_key, payload):
+    room = f"user_{user_id}"
+    if group_key:
+        _get_emit_debouncer().submit((user_id, notification_type, group_key),
+                                     socketio.emit, 'notification', payload, room=room)
+    else:
+        socketio.emit('notification', payload, room=room)
+
+# Function to stage a notification in the caller's transaction
+def send_notification(user_id, notification_type, data, group_key=None):
+    """Add a notification to the current session and push it once the caller commits.
+
+    Nothing is committed here. The socket push is staged in the session's
+    outbox and only goes out after the caller's commit succeeds.
+
+    Notifications sharing a `group_key` (e.g. "media_12") are merged into the
+    user's latest unviewed one of the same type while it is younger than
+    NOTIFICATION_COALESCE_WINDOW: its count goes up and its data becomes the
+    latest event's. Pushes for a group are debounced the same way.
+    """
+    send_notifications([user_id], notification_type, data, group_key=group_key)
+
+def send_notifications(user_ids, notification_type, data, group_key=None):
+    """send_notification() for many recipients of the same event, in a fixed number of statements.
+
+    One SELECT finds the open group rows, one UPDATE bumps them all and one
+    batched INSERT adds rows for everyone else, however many users there are.
+    """
+    user_ids = [int(user_id) for user_id in dict.fromkeys(user_ids)]
+    if not user_ids:
+        return
+
+    open_ids = {}  # user_id -> id of their latest open notification in the group
+    if group_key:
+        cutoff = datetime.now(UTC).replace(tzinfo=None) - \
+            timedelta(seconds=current_app.config['NOTIFICATION_COALESCE_WINDOW'])
+        rows = db.session.query(Notification.user_id, db.func.max(Notification.id)).filter(
+            Notification.user_id.in_(user_ids),
+            Notification.notification_type == notification_type,
+            Notification.group_key == group_key,
+            Notification.viewed.isnot(True),
+            Notification.created_at >= cutoff
+        ).group_by(Notification.user_id).all()
+        open_ids = dict(rows)
+
+    pushed = {}  # user_id -> (notification id, count)
+    if open_ids:
+        # Increment in SQL so concurrent events on a hot item are all counted
+        updated = db.session.execute(
+            update(Notification)
+            .where(Notification.id.in_(list(open_ids.values())))
+            .values(count=Notification.count + 1, data=data, updated_at=db.func.current_timestamp())
+            .returning(Notification.user_id, Notification.id, Notification.count)
+            .execution_options(synchronize_session=False)
+        ).all()
+        pushed.update((user_id, (notification_id, count)) for user_id, notification_id, count in updated)
+
+    new_ids = [user_id for user_id in user_ids if user_id not in pushed]
+    if new_ids:
+        created = db.session.execute(
+            insert(Notification).returning(Notification.user_id, Notification.id),
+            [{'user_id': user_id, 'notification_type': notification_type, 'group_key': group_key,
+              'count': 1, 'data': data} for user_id in new_ids]
+        ).all()
+        pushed.update((user_id, (notification_id, 1)) for user_id, notification_id in created)
+
+    for user_id in user_ids:
+        notification_id, count = pushed[user_id]
+        stage_after_commit(_push_notification, user_id, notification_type, group_key, {
+            'id': notification_id,
+            'type': notification_type,
+            'data': data,
+            'count': count
+        })
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(1)
 def get_notifications():
     user_id = get_jwt_identity()
-    notifications = Notification.query.filter_by(user_id=user_id).order_by(Notification.created_at.desc()).all()
+    notifications = Notification.query.filter_by(user_id=user_id).order_by(Notification.updated_at.desc()).all()
     
     results = [{
         "id": notification.id,
         "type": notification.notification_type,
         "data": notification.data,
+        "count": notification.count,
         "viewed": notification.viewed,
-        "created_at": notification.created_at
+        "created_at": notification.created_at,
+        "updated_at": notification.updated_at
     } for notification in notifications]
     
     return jsonify({"notifications": results}), 200
@@ -64,19 +158,23 @@ def get_notifications():
 def read_all_notifications():
     user_id = get_jwt_identity()
 
-    notifications = Notification.query.filter_by(user_id=user_id).order_by(Notification.created_at.desc()).all()
-    for notif in notifications:
-        notif.viewed = True
-        db.session.add(notif)
-
+    # One UPDATE for the unread rows instead of loading and flushing each one
+    Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.viewed.isnot(True)
+    ).update({Notification.viewed: True}, synchronize_session=False)
     db.session.commit()
 
+    notifications = Notification.query.filter_by(user_id=user_id).order_by(Notification.updated_at.desc()).all()
+
     results = [{
         "id": notif.id,
         "type": notif.notification_type,
         "data": notif.data,
+        "count": notif.count,
         "viewed": notif.viewed,
-        "created_at": notif.created_at
+        "created_at": notif.created_at,
+        "updated_at": notif.updated_at
     } for notif in notifications]
     
     return jsonify({"notifications": results}), 200
\ No newline at end of file
@@ -5,12 +5,31 @@ from app.models.user import User
 from app import db
 from app.models.console import PlayStation, Xbox, Steam, Nintendo, Discord
 from app.models.friendship import Friendship
+from app.utils.replica import replica_reads
+from app.utils.query_stats import query_budget
 from sqlalchemy import or_
 
 bp = Blueprint('profile', __name__, url_prefix='/api/profile')
 
+def _friend_lists(user_id):
+    """Return (following, followers) as lists of {"user_id", "username"}, one query each."""
+    # Users they're following (they added them)
+    following = db.session.query(User.id, User.username)\
+        .join(Friendship, Friendship.friend_id == User.id)\
+        .filter(Friendship.user_id == user_id, Friendship.status == 'accepted')\
+        .order_by(Friendship.id).all()
+    # Users following them (they were added)
+    followers = db.session.query(User.id, User.username)\
+        .join(Friendship, Friendship.user_id == User.id)\
+        .filter(Friendship.friend_id == user_id, Friendship.status == 'accepted')\
+        .order_by(Friendship.id).all()
+    return ([{"user_id": friend_id, "username": username} for friend_id, username in following],
+            [{"user_id": friend_id, "username": username} for friend_id, username in followers])
+
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(8)
 def get_profile():
     user_id = get_jwt_identity()
     current_app.logger.debug(f'Getting profile for user_id: {user_id}')
@@ -21,36 +40,7 @@ def get_profile():
         current_app.logger.error(f'Profile not found for user_id: {user_id}')
         return jsonify({"error": "Profile not found"}), 404
     
-    # Users I'm following (I added them)
-    following = Friendship.query.filter_by(
-        user_id=user_id, 
-        status='accepted'
-    ).all()
-    
-    # Users following me (they added me)
-    followers = Friendship.query.filter_by(
-        friend_id=user_id, 
-        status='accepted'
-    ).all()
-    
-    # Convert to lists of user details
-    following_list = []
-    for friend in following:
-        friend_user = User.query.get(friend.friend_id)
-        if friend_user:
-            following_list.append({
-                "user_id": friend_user.id,
-                "username": friend_user.username
-            })
-    
-    followers_list = []
-    for friend in followers:
-        friend_user = User.query.get(friend.user_id)
-        if friend_user:
-            followers_list.append({
-                "user_id": friend_user.id,
-                "username": friend_user.username
-            })
+    following_list, followers_list = _friend_lists(user_id)
     
     discord = Discord.query.filter_by(user_id=user_id).first()
     
@@ -122,6 +112,7 @@ def update_games():
 
 @bp.route('/consoles', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_consoles():
     user_id = get_jwt_identity()
     
@@ -215,6 +206,8 @@ def update_discord():
 
 @bp.route('/@<string:username>', methods=['GET'])
 @jwt_required()
+@replica_reads
+@query_budget(10)
 def get_other_profile(username):
     current_user_id = get_jwt_identity()
     current_app.logger.debug(f'Getting profile for username: {username}')
@@ -238,36 +231,7 @@ def get_other_profile(username):
     # Determine friend_request_from if status is pending
     friend_request_from = friendship.user_id if friendship and friendship.status == 'pending' else None
     
-    # Users they're following
-    following = Friendship.query.filter_by(
-        user_id=target_user_id, 
-        status='accepted'
-    ).all()
-    
-    # Users following them
-    followers = Friendship.query.filter_by(
-        friend_id=target_user_id, 
-        status='accepted'
-    ).all()
-    
-    # Convert to lists of user details
-    following_list = []
-    for friend in following:
-        friend_user = User.query.get(friend.friend_id)
-        if friend_user:
-            following_list.append({
-                "user_id": friend_user.id,
-                "username": friend_user.username
-            })
-    
-    followers_list = []
-    for friend in followers:
-        friend_user = User.query.get(friend.user_id)
-        if friend_user:
-            followers_list.append({
-                "user_id": friend_user.id,
-                "username": friend_user.username
-            })
+    following_list, followers_list = _friend_lists(target_user_id)
     
     # Get console information
     discord = Discord.query.filter_by(user_id=target_user_id).first()
@@ -298,6 +262,7 @@ def get_other_profile(username):
 
 @bp.route('/search', methods=['GET'])
 @jwt_required()
+@replica_reads
 def search_profiles():
     search_query = request.args.get('query', '')
     
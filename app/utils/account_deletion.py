@@ -0,0 +1,195 @@
+import os
+from flask import current_app
+from sqlalchemy import delete, func, insert, or_, select, update
+from app import db, socketio
+from app.models.user import User
+from app.models.profile import Profile
+from app.models.media import Media, Comment, Reaction
+from app.models.friendship import Friendship
+from app.models.notification import Notification
+from app.models.chat import ChatRoom, ChatMessage, UserChatAssociation, ChatRoomRemoval
+from app.models.console import PlayStation, Xbox, Steam, Nintendo, Discord
+from app.utils.db_pool import no_statement_timeout
+from app.utils.derivatives import remove_derivatives
+from app.utils.reactions import uncount_reactions, delete_media_reactions
+from app.utils.room_members import invalidate_room_members
+from app.utils.chat_archive import queue_archive_purge
+from app.utils.metrics import QUEUE_DEPTH
+
+CONSOLE_MODELS = (PlayStation, Xbox, Steam, Nintendo, Discord)
+
+def _execute_delete(model, criterion):
+    db.session.execute(delete(model).where(criterion).execution_options(synchronize_session=False))
+
+def _delete_where(model, criterion, batch_size):
+    """DELETE matching rows in one statement, or in id chunks committed one at a time."""
+    if not batch_size:
+        _execute_delete(model, criterion)
+        return
+    while True:
+        ids = [row_id for (row_id,) in db.session.query(model.id).filter(criterion).limit(batch_size)]
+        if not ids:
+            return
+        _execute_delete(model, model.id.in_(ids))
+        db.session.commit()
+
+def _delete_comments(user_id, batch_size):
+    """Delete the user's comments on other people's media and fix their comment_count."""
+    while True:
+        if batch_size:
+            ids = [row_id for (row_id,) in db.session.query(Comment.id)
+                   .filter(Comment.user_id == user_id).limit(batch_size)]
+            if not ids:
+                return
+            scope = Comment.id.in_(ids)
+        else:
+            scope = Comment.user_id == user_id
+        removed = select(func.count(Comment.id))\
+            .where(Comment.media_id == Media.id, scope)\
+            .scalar_subquery()
+        db.session.execute(
+            update(Media)
+            .where(Media.id.in_(select(Comment.media_id).where(scope)))
+            .values(comment_count=Media.comment_count - removed)
+            .execution_options(synchronize_session=False)
+        )
+        _execute_delete(Comment, scope)
+        if not batch_size:
+            return
+        db.session.commit()
+
+def _delete_reactions(user_id, batch_size):
+    """Delete the user's reactions and take them off the media counters."""
+    while True:
+        if batch_size:
+            ids = [row_id for (row_id,) in db.session.query(Reaction.id)
+                   .filter(Reaction.user_id == user_id).limit(batch_size)]
+            if not ids:
+                return
+            scope = Reaction.id.in_(ids)
+        else:
+            scope = Reaction.user_id == user_id
+        uncount_reactions(scope)
+        _execute_delete(Reaction, scope)
+        if not batch_size:
+            return
+        db.session.commit()
+
+def _remove_files(upload_folder, files):
+    for file_path, variants in files:
+        try:
+            path = os.path.join(upload_folder, file_path)
+            if os.path.exists(path):
+                os.remove(path)
+            remove_derivatives(upload_folder, variants)
+        except OSError:
+            pass  # Left for gc-uploads
+
+def _queue_file_removal(files):
+    if files:
+        socketio.start_background_task(_remove_files, current_app.config['UPLOAD_FOLDER'], files)
+
+def _delete_media(user_id, batch_size):
+    files = []
+    while True:
+        query = db.session.query(Media.id, Media.file_path, Media.variants).filter(Media.user_id == user_id)
+        rows = query.limit(batch_size).all() if batch_size else query.all()
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        _execute_delete(Comment, Comment.media_id.in_(ids))
+        delete_media_reactions(ids)
+        _execute_delete(Media, Media.id.in_(ids))
+        batch_files = [(row.file_path, row.variants) for row in rows if row.file_path]
+        if not batch_size:
+            files.extend(batch_files)
+            break
+        db.session.commit()
+        _queue_file_removal(batch_files)
+    return files
+
+def _leave_chat_rooms(user_id, batch_size):
+    room_ids = [room_id for (room_id,) in db.session.query(UserChatAssociation.chat_room_id)
+                .filter(UserChatAssociation.user_id == user_id)]
+    shared_group_ids = {room_id for (room_id,) in db.session.query(UserChatAssociation.chat_room_id)
+                        .join(ChatRoom, ChatRoom.id == UserChatAssociation.chat_room_id)
+                        .filter(
+                            UserChatAssociation.chat_room_id.in_(room_ids),
+                            UserChatAssociation.user_id != user_id,
+                            ChatRoom.is_group.is_(True)
+                        ).distinct()}
+    # A 1-to-1 chat has no one left to talk to, and neither does an emptied group
+    dead_room_ids = [room_id for room_id in room_ids if room_id not in shared_group_ids]
+
+    if dead_room_ids:
+        # The other side of a 1-to-1 chat loses the room too; tell their sync about it
+        left_behind = db.session.query(UserChatAssociation.chat_room_id, UserChatAssociation.user_id).filter(
+            UserChatAssociation.chat_room_id.in_(dead_room_ids),
+            UserChatAssociation.user_id != user_id
+        ).all()
+        if left_behind:
+            db.session.execute(insert(ChatRoomRemoval), [{"user_id": other_id, "chat_room_id": room_id}
+                                                         for room_id, other_id in left_behind])
+        _delete_where(ChatMessage, ChatMessage.room_id.in_(dead_room_ids), batch_size)
+        _execute_delete(UserChatAssociation, UserChatAssociation.chat_room_id.in_(dead_room_ids))
+        _execute_delete(ChatRoom, ChatRoom.id.in_(dead_room_ids))
+
+    _delete_where(ChatMessage, ChatMessage.sender_id == user_id, batch_size)
+    _execute_delete(UserChatAssociation, UserChatAssociation.user_id == user_id)
+    _execute_delete(ChatRoomRemoval, ChatRoomRemoval.user_id == user_id)
+    return room_ids, dead_room_ids
+
+def delete_account_data(user_id, batch_size=None):
+    """Remove a user and everything that references them.
+
+    Children are deleted before parents with set-based DELETEs. Without a
+    batch size the whole account goes in one transaction. With one, large
+    tables are deleted in committed chunks and the user row goes last, so an
+    interrupted run can simply be started again. Upload files are removed on
+    a background task after their rows are gone.
+    """
+    user_id = int(user_id)
+
+    _delete_comments(user_id, batch_size)
+    _delete_reactions(user_id, batch_size)
+    files = _delete_media(user_id, batch_size)
+    _delete_where(Notification, Notification.user_id == user_id, batch_size)
+    _execute_delete(Friendship, or_(Friendship.user_id == user_id, Friendship.friend_id == user_id))
+    room_ids, dead_room_ids = _leave_chat_rooms(user_id, batch_size)
+    for model in CONSOLE_MODELS:
+        _execute_delete(model, model.user_id == user_id)
+    _execute_delete(Profile, Profile.user_id == user_id)
+    _execute_delete(User, User.id == user_id)
+    db.session.commit()
+
+    invalidate_room_members(*room_ids)
+    _queue_file_removal(files)
+    queue_archive_purge(dead_room_ids, user_id)
+
+def is_heavy_account(user_id, threshold):
+    """True when the user owns more than `threshold` rows in any large table."""
+    for query in (
+        db.session.query(Media.id).filter(Media.user_id == user_id),
+        db.session.query(Comment.id).filter(Comment.user_id == user_id),
+        db.session.query(Reaction.id).filter(Reaction.user_id == user_id),
+        db.session.query(ChatMessage.id).filter(ChatMessage.sender_id == user_id),
+        db.session.query(Notification.id).filter(Notification.user_id == user_id),
+    ):
+        if query.offset(threshold).first() is not None:
+            return True
+    return False
+
+def _delete_in_background(app, user_id):
+    with app.app_context(), no_statement_timeout():
+        try:
+            delete_account_data(user_id, batch_size=app.config['ACCOUNT_DELETE_BATCH_SIZE'])
+            app.logger.info(f'Deleted account {user_id}')
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'Account deletion for user {user_id} stopped, rerun with flask delete-account: {str(e)}')
+        finally:
+            QUEUE_DEPTH.labels('account_deletion').dec()
+
+def schedule_account_deletion(user_id):
+    QUEUE_DEPTH.labels('account_deletion').inc()
+    socketio.start_background_task(_delete_in_background, current_app._get_current_object(), user_id)
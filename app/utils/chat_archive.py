@@ -0,0 +1,254 @@
+import gzip
+import json
+import os
+import shutil
+from datetime import date, datetime, UTC
+from flask import current_app
+from sqlalchemy import delete, select, text
+from app import db, socketio
+from app.models.chat import ChatMessage
+from app.utils.db_pool import no_statement_timeout
+from app.utils.partitioning import (is_partitioned, ensure_monthly_partitions, monthly_partitions,
+                                    add_months, months_ago, warn_if_unmaintained)
+
+# Archived chat history lives under CHAT_ARCHIVE_FOLDER as one gzipped JSON
+# lines file per room and month: <YYYY-MM>/room_<room_id>.jsonl.gz, each
+# sorted by message id. A month directory only appears once it is complete,
+# and its rows are removed from chat_message after that.
+
+def _month_dir(folder, month):
+    return os.path.join(folder, f"{month.year:04d}-{month.month:02d}")
+
+def _room_file(month_dir, room_id):
+    return os.path.join(month_dir, f"room_{room_id}.jsonl.gz")
+
+def archived_months(folder):
+    """Months with archived history, oldest first."""
+    months = []
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            year, _, month = name.partition('-')
+            if len(name) == 7 and year.isdigit() and month.isdigit():
+                months.append(date(int(year), int(month), 1))
+    return sorted(months)
+
+def _read_room_file(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def _write_room_file(path, rows, mode='wt'):
+    # Appending ('at') adds a gzip member, which readers see as one stream
+    with gzip.open(path, mode, encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(',', ':')) + '\n')
+
+def _message_row(message):
+    return {
+        "id": message.id,
+        "room_id": message.room_id,
+        "sender_id": message.sender_id,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+        "client_msg_id": message.client_msg_id
+    }
+
+def _month_batches(month, batch_size):
+    """Yield the month's messages in id order, one query of `batch_size` rows at a time."""
+    last_id = 0
+    while True:
+        batch = db.session.query(
+            ChatMessage.id, ChatMessage.room_id, ChatMessage.sender_id,
+            ChatMessage.content, ChatMessage.timestamp, ChatMessage.client_msg_id
+        ).filter(
+            ChatMessage.timestamp >= month,
+            ChatMessage.timestamp < add_months(month, 1),
+            ChatMessage.id > last_id
+        ).order_by(ChatMessage.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+def _export_month(folder, month, batch_size):
+    """Write the month's messages into its archive directory.
+
+    Returns (message count, highest exported id).
+    """
+    final_dir = _month_dir(folder, month)
+    tmp_dir = final_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    count, last_id = 0, None
+    for batch in _month_batches(month, batch_size):
+        rooms = {}
+        for message in batch:
+            rooms.setdefault(message.room_id, []).append(_message_row(message))
+        for room_id, rows in rooms.items():
+            _write_room_file(_room_file(tmp_dir, room_id), rows, mode='at')
+        count += len(batch)
+        last_id = batch[-1].id
+
+    if not count:
+        shutil.rmtree(tmp_dir)
+    elif os.path.isdir(final_dir):
+        for name in os.listdir(final_dir):
+            previous, current = os.path.join(final_dir, name), os.path.join(tmp_dir, name)
+            if os.path.exists(current):
+                # A rerun after an interrupted delete merges with what was archived before
+                merged = {row['id']: row for row in _read_room_file(previous)}
+                merged.update((row['id'], row) for row in _read_room_file(current))
+                _write_room_file(current, [merged[row_id] for row_id in sorted(merged)])
+            else:
+                shutil.copy2(previous, current)
+        old_dir = final_dir + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(final_dir, old_dir)
+        os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, final_dir)
+    return count, last_id
+
+def _remove_month_rows(month, last_id, partitions, batch_size):
+    connection = db.session.connection()
+    partition = partitions.get(month)
+    if partition:
+        # The whole month goes at once; only stragglers in the default partition remain
+        connection.execute(text(f'DROP TABLE "{partition}"'))
+        connection.execute(text(
+            "DELETE FROM chat_message_pdefault WHERE timestamp >= :start AND timestamp < :end"
+        ), {"start": month, "end": add_months(month, 1)})
+        db.session.commit()
+        return
+    # Only rows the export saw: nothing above last_id was archived
+    batch = select(ChatMessage.id).where(
+        ChatMessage.timestamp >= month,
+        ChatMessage.timestamp < add_months(month, 1),
+        ChatMessage.id <= last_id
+    ).order_by(ChatMessage.id).limit(batch_size)
+    while True:
+        result = db.session.execute(delete(ChatMessage).where(ChatMessage.id.in_(batch))
+                                    .execution_options(synchronize_session=False))
+        db.session.commit()
+        if result.rowcount < batch_size:
+            return
+
+def archive_chat_messages(folder, older_than_months, batch_size):
+    """Move whole months older than `older_than_months` from chat_message into archive files.
+
+    Each month is exported first and removed from the table only once its
+    archive directory is in place, so an interrupted run can be repeated.
+    On a partitioned Postgres table the month's partition is dropped.
+    Returns the archived months with their message counts.
+    """
+    cutoff = months_ago(older_than_months)
+    connection = db.session.connection()
+    partitioned = is_partitioned(connection, 'chat_message')
+    partitions = {month: name for name, month in monthly_partitions(connection, 'chat_message')} \
+        if partitioned else {}
+
+    oldest = db.session.query(db.func.min(ChatMessage.timestamp))\
+        .filter(ChatMessage.timestamp < cutoff).scalar()
+    # Start at the oldest row or the oldest partition, so empty old partitions go too
+    starts = [month for month in partitions if month < cutoff]
+    if oldest:
+        starts.append(date(oldest.year, oldest.month, 1))
+    archived = []
+    month = min(starts, default=cutoff)
+    while month < cutoff:
+        count, last_id = _export_month(folder, month, batch_size)
+        if count or month in partitions:
+            _remove_month_rows(month, last_id, partitions, batch_size)
+        if count:
+            archived.append((month, count))
+        month = add_months(month, 1)
+
+    for month, count in archived:
+        current_app.logger.info(f'Archived {count} chat messages from {month:%Y-%m}')
+    return archived
+
+def read_archived_messages(folder, room_id, before_id=None, limit=50):
+    """Return up to `limit` archived messages of a room older than `before_id`, oldest first.
+
+    Months are read newest first, which is also id order since ids are
+    handed out as messages arrive.
+    """
+    collected = []
+    for month in reversed(archived_months(folder)):
+        path = _room_file(_month_dir(folder, month), room_id)
+        if not os.path.exists(path):
+            continue
+        rows = [row for row in _read_room_file(path) if before_id is None or row['id'] < before_id]
+        collected = rows[max(len(rows) - (limit - len(collected)), 0):] + collected
+        if len(collected) >= limit:
+            break
+    for row in collected:
+        row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+    return collected
+
+def purge_archived_messages(folder, room_ids=(), sender_id=None):
+    """Remove archived rooms entirely, and a sender's messages from every archived room."""
+    for month in archived_months(folder):
+        month_dir = _month_dir(folder, month)
+        for room_id in room_ids:
+            path = _room_file(month_dir, room_id)
+            if os.path.exists(path):
+                os.remove(path)
+        if sender_id is None:
+            continue
+        for name in os.listdir(month_dir):
+            path = os.path.join(month_dir, name)
+            rows = _read_room_file(path)
+            kept = [row for row in rows if row['sender_id'] != sender_id]
+            if len(kept) == len(rows):
+                continue
+            if kept:
+                _write_room_file(path + '.tmp', kept)
+                os.replace(path + '.tmp', path)
+            else:
+                os.remove(path)
+
+def _purge_in_background(app, room_ids, sender_id):
+    with app.app_context():
+        try:
+            purge_archived_messages(app.config['CHAT_ARCHIVE_FOLDER'], room_ids, sender_id)
+        except Exception as e:
+            app.logger.error(f'Purging archived chat messages for user {sender_id} failed: {str(e)}')
+
+def queue_archive_purge(room_ids, sender_id):
+    if archived_months(current_app.config['CHAT_ARCHIVE_FOLDER']):
+        socketio.start_background_task(_purge_in_background, current_app._get_current_object(),
+                                       list(room_ids), sender_id)
+
+def maintain_chat_partitions():
+    """Create the current and upcoming chat_message partitions on a partitioned table."""
+    connection = db.session.connection()
+    if is_partitioned(connection, 'chat_message'):
+        ensure_monthly_partitions(connection, 'chat_message', datetime.now(UTC).date())
+        db.session.commit()
+
+def maintain_chat_storage(app):
+    """Create upcoming chat_message partitions and archive old months when configured."""
+    maintain_chat_partitions()
+    if app.config['CHAT_ARCHIVE_AFTER_MONTHS'] > 0:
+        return archive_chat_messages(app.config['CHAT_ARCHIVE_FOLDER'],
+                                     app.config['CHAT_ARCHIVE_AFTER_MONTHS'],
+                                     app.config['CHAT_ARCHIVE_BATCH_SIZE'])
+    return []
+
+def _run_periodically(app):
+    while True:
+        socketio.sleep(app.config['CHAT_ARCHIVE_INTERVAL'])
+        with app.app_context(), no_statement_timeout():
+            try:
+                maintain_chat_storage(app)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Chat archiving failed: {str(e)}')
+
+def start_chat_archiver(app):
+    if app.config['CHAT_ARCHIVE_INTERVAL'] > 0:
+        socketio.start_background_task(_run_periodically, app)
+    else:
+        warn_if_unmaintained(app, 'chat_message', 'CHAT_ARCHIVE_INTERVAL', 'archive-chat')
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from flask import current_app, jsonify
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from app import db
+from app.utils.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+# Connection pool setup.
+#
+# Under the eventlet worker every request is a greenlet, so up to
+# worker-connections requests share DB_POOL_SIZE + DB_MAX_OVERFLOW
+# connections. Requests beyond that wait up to DB_POOL_TIMEOUT seconds for a
+# connection and then fail, rather than piling up until gunicorn's timeout.
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings.
+
+    Only Postgres gets a sized pool and a statement timeout; SQLite keeps
+    SQLAlchemy's defaults, which depend on whether the database is in memory.
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT'] > 0:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"}
+    return options
+
+@event.listens_for(Session, 'after_begin')
+def _lift_statement_timeout(session, transaction, connection):
+    if session.info.get('no_statement_timeout') and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+
+@contextmanager
+def no_statement_timeout():
+    """Run db.session work without DB_STATEMENT_TIMEOUT; also usable as a decorator.
+
+    For CLI commands and background maintenance, which scan or rewrite whole
+    tables and, like migrations, aren't held to the limit meant for requests.
+    SET LOCAL lasts until the transaction ends, so every transaction begun
+    inside the block gets it again and pooled connections go back unchanged.
+    """
+    session = db.session()
+    session.info['no_statement_timeout'] = True
+    if session.in_transaction() and db.engine.dialect.name == 'postgresql':
+        session.execute(text('SET LOCAL statement_timeout = 0'))
+    try:
+        yield
+    finally:
+        session.info.pop('no_statement_timeout', None)
+
+def make_psycopg_green():
+    """Let psycopg2 yield to other greenlets while it waits on Postgres.
+
+    psycopg2 talks to the server through libpq, which eventlet's monkey
+    patching doesn't reach, so without this one slow query blocks every
+    request on the worker. Only applies when eventlet has patched sockets,
+    as gunicorn's eventlet worker does.
+    """
+    try:
+        from eventlet.patcher import is_monkey_patched
+    except ImportError:
+        return False
+    if not is_monkey_patched('socket'):
+        return False
+    from psycogreen.eventlet import patch_psycopg
+    patch_psycopg()
+    return True
+
+def pool_stats():
+    """Current usage of the primary pool; waits and timeouts are in /api/metrics."""
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'idle': pool.checkedin(),
+    }
+
+def pool_saturated(pool=None):
+    """True when every connection the pool (the primary's by default) may open is checked out."""
+    pool = db.engine.pool if pool is None else pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return False  # A negative max_overflow means no limit
+    return pool.checkedout() >= pool.size() + pool._max_overflow
+
+def handle_pool_timeout(e):
+    current_app.logger.warning(f'No database connection free within the pool timeout: {str(e)}')
+    return jsonify({"error": "Server is busy, please retry"}), 503, {'Retry-After': '1'}
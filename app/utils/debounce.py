@@ -0,0 +1,52 @@
+import threading
+import time
+from app import socketio
+
+class Debouncer:
+    """Rate-limit calls per key.
+
+    The first call for a key runs straight away. Calls arriving within
+    `interval` of it are collapsed into one trailing call, made with the
+    latest arguments once the interval has passed.
+    """
+
+    def __init__(self, interval, max_keys=10000):
+        self.interval = interval
+        self.max_keys = max_keys
+        self._state = {}  # key -> [last_run, pending (func, args, kwargs) or None]
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        # Forget keys that have been quiet for a whole interval and have nothing pending
+        for key in [k for k, (last, pending) in self._state.items()
+                    if pending is None and now - last >= self.interval]:
+            del self._state[key]
+
+    def submit(self, key, func, *args, **kwargs):
+        """Run or schedule func(*args, **kwargs). Returns True if it ran immediately."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or (state[1] is None and now - state[0] >= self.interval):
+                if len(self._state) >= self.max_keys:
+                    self._prune(now)
+                self._state[key] = [now, None]
+                run_now = True
+            else:
+                if state[1] is None:
+                    socketio.start_background_task(self._flush, key, self.interval - (now - state[0]))
+                state[1] = (func, args, kwargs)
+                run_now = False
+        if run_now:
+            func(*args, **kwargs)
+        return run_now
+
+    def _flush(self, key, delay):
+        socketio.sleep(max(delay, 0))
+        with self._lock:
+            state = self._state.get(key)
+            if not state or state[1] is None:
+                return
+            func, args, kwargs = state[1]
+            self._state[key] = [time.monotonic(), None]
+        func(*args, **kwargs)
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it only video posters are produced
+    Image = None
+
+# Derivatives live in their own folder so they never collide with uploads
+DERIVATIVE_FOLDER = 'derivatives'
+JPEG_QUALITY = 82
+
+def derivative_filename(filename, variant):
+    # e.g. "<uuid>_cat.png" -> "<uuid>_cat.png.thumb.jpg"
+    return f"{filename}.{variant}.jpg"
+
+def source_filename(derivative_name):
+    # Inverse of derivative_filename, used to map a derivative back to its upload
+    return derivative_name.rsplit('.', 2)[0]
+
+def _save_resized(image, dest_path, max_width):
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.LANCZOS)
+    image.save(dest_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return image.width, image.height
+
+def _extract_poster(ffmpeg_path, video_path, dest_path):
+    # Grab a frame one second in; fall back to the first frame for very short clips
+    for offset in ('1', '0'):
+        result = subprocess.run(
+            [ffmpeg_path, '-y', '-loglevel', 'error', '-ss', offset, '-i', video_path,
+             '-frames:v', '1', dest_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60
+        )
+        if result.returncode == 0 and os.path.exists(dest_path) and os.path.getsize(dest_path) > 0:
+            return True
+    return False
+
+def generate_derivatives(upload_folder, filename, media_type, sizes, ffmpeg_path=None):
+    """Create resized variants of an upload and return {variant: filename}.
+
+    Images get one JPEG per entry in `sizes` (name -> max width). Videos get a
+    `poster` still frame when ffmpeg is available, plus the same sized variants
+    cut from that frame. Animated GIFs only get a thumbnail so the feed keeps
+    the original animation for full views.
+    """
+    source_path = os.path.join(upload_folder, filename)
+    output_folder = os.path.join(upload_folder, DERIVATIVE_FOLDER)
+    os.makedirs(output_folder, exist_ok=True)
+    variants = {}
+
+    if media_type == 'video':
+        if not ffmpeg_path:
+            return variants
+        poster_name = derivative_filename(filename, 'poster')
+        poster_path = os.path.join(output_folder, poster_name)
+        if not _extract_poster(ffmpeg_path, source_path, poster_path):
+            return variants
+        variants['poster'] = poster_name
+        source_path = poster_path
+
+    if Image is None:
+        return variants
+
+    with Image.open(source_path) as image:
+        animated = getattr(image, 'is_animated', False)
+        for variant, max_width in sizes.items():
+            if animated and variant != 'thumb':
+                continue
+            name = derivative_filename(filename, variant)
+            # Write to a temp file first so readers never see a half-written image
+            fd, tmp_path = tempfile.mkstemp(dir=output_folder, suffix='.tmp')
+            os.close(fd)
+            try:
+                _save_resized(image, tmp_path, max_width)
+                os.replace(tmp_path, os.path.join(output_folder, name))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            variants[variant] = name
+
+    return variants
+
+def remove_derivatives(upload_folder, variants):
+    for name in (variants or {}).values():
+        path = os.path.join(upload_folder, DERIVATIVE_FOLDER, name)
+        if os.path.exists(path):
+            os.remove(path)
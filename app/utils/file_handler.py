@@ -1,27 +1,85 @@
 import os
 from werkzeug.utils import secure_filename
 from flask import current_app
+import shutil
 import uuid
 
+# Number of leading bytes needed to recognise every format we accept
+SNIFF_BYTES = 16
+
+# Leading bytes of the image formats we accept
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+# MIME types each allowed extension may contain
+EXTENSION_MIME_TYPES = {
+    'png': {'image/png'},
+    'jpg': {'image/jpeg'},
+    'jpeg': {'image/jpeg'},
+    'gif': {'image/gif'},
+    'mp4': {'video/mp4', 'video/quicktime'},
+    'mov': {'video/quicktime', 'video/mp4'},
+    'avi': {'video/x-msvideo'},
+}
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Top-level atoms that can open a QuickTime file that has no ftyp box
+QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+def sniff_mime_type(header):
+    """Return the MIME type detected from a file's leading bytes, or None."""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return mime_type
+    if header[4:8] == b'ftyp':
+        return 'video/quicktime' if header[8:12] == b'qt  ' else 'video/mp4'
+    if header[4:8] in QUICKTIME_ATOMS:
+        return 'video/quicktime'
+    if header[:4] == b'RIFF' and header[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    return None
+
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-def save_file(file, file_type):
-    if file and allowed_file(file.filename, 
-                           current_app.config['ALLOWED_IMAGE_EXTENSIONS'] if file_type == 'image' 
-                           else current_app.config['ALLOWED_VIDEO_EXTENSIONS']):
-        
-        # Create unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        # Create upload folder if it doesn't exist
-        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
-        
-        return unique_filename
-    return None 
\ No newline at end of file
+def save_file(file):
+    """Stream an upload into UPLOAD_FOLDER after checking its leading bytes.
+
+    Returns (filename, mime_type), or (None, None) when the extension is not
+    allowed or the content does not match it. Nothing is written for rejected
+    files.
+    """
+    if not file or '.' not in file.filename:
+        return None, None
+
+    header = file.stream.read(SNIFF_BYTES)
+    mime_type = sniff_mime_type(header)
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    if not mime_type or mime_type not in EXTENSION_MIME_TYPES.get(extension, ()):
+        return None, None
+
+    allowed_extensions = current_app.config['ALLOWED_IMAGE_EXTENSIONS'] if mime_type.startswith('image/') \
+        else current_app.config['ALLOWED_VIDEO_EXTENSIONS']
+    if not allowed_file(file.filename, allowed_extensions):
+        return None, None
+
+    # Create unique filename
+    filename = secure_filename(file.filename)
+    unique_filename = f"{uuid.uuid4()}_{filename}"
+    
+    # Create upload folder if it doesn't exist
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Save file: the bytes already read for sniffing, then the rest of the stream
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+    with open(file_path, 'wb') as dest:
+        dest.write(header)
+        shutil.copyfileobj(file.stream, dest, COPY_CHUNK_SIZE)
+    
+    return unique_filename, mime_type
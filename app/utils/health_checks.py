@@ -0,0 +1,116 @@
+import math
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, UTC
+from flask import current_app
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from app import db
+from app.utils.db_pool import pool_stats, pool_saturated
+
+# Readiness checks behind /api/health/ready. Results are cached for
+# HEALTH_CACHE_SECONDS so frequent probes from the load balancer cost at most
+# one round of checks per interval.
+
+_cache = None  # (expires_at, ready, checks, checked_at)
+_cache_lock = threading.Lock()
+_redis = None
+_probe_engines = {}  # database URL -> engine used only for pings
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def _probe_engine(engine):
+    """An engine with no pool for pinging `engine`'s database.
+
+    Pings open their own connection, so they never wait in the app's pool for
+    up to DB_POOL_TIMEOUT, and on Postgres the connect and the query both
+    give up around HEALTH_DB_SLOW_MS.
+    """
+    key = engine.url.render_as_string(hide_password=False)
+    probe = _probe_engines.get(key)
+    if probe is None:
+        connect_args = {}
+        if engine.url.get_backend_name() == 'postgresql':
+            slow_ms = current_app.config['HEALTH_DB_SLOW_MS']
+            # libpq treats connect timeouts under 2 seconds as 2
+            connect_args = {'connect_timeout': max(2, math.ceil(slow_ms / 1000)),
+                            'options': f'-c statement_timeout={slow_ms}'}
+        probe = _probe_engines.setdefault(key, create_engine(engine.url, poolclass=NullPool,
+                                                             connect_args=connect_args))
+    return probe
+
+def _check_database(engine):
+    slow_ms = current_app.config['HEALTH_DB_SLOW_MS']
+    started = time.perf_counter()
+    try:
+        with _probe_engine(engine).connect() as connection:
+            connection.execute(text('SELECT 1'))
+    except Exception as e:
+        return {"ok": False, "latency_ms": _elapsed_ms(started), "error": str(e)}
+    latency_ms = _elapsed_ms(started)
+    if latency_ms > slow_ms:
+        return {"ok": False, "latency_ms": latency_ms, "error": f"Slower than {slow_ms} ms"}
+    return {"ok": True, "latency_ms": latency_ms}
+
+def _check_pool():
+    stats = pool_stats()
+    if pool_saturated():
+        return {"ok": False, **stats, "error": "Every connection is in use"}
+    return {"ok": True, **stats}
+
+def _check_disk():
+    min_free_mb = current_app.config['HEALTH_MIN_FREE_DISK_MB']
+    # The folder is created on first upload; until then measure the volume it will live on
+    path = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    try:
+        free_mb = shutil.disk_usage(path).free // (1024 * 1024)
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    if free_mb < min_free_mb:
+        return {"ok": False, "free_mb": free_mb, "error": f"Less than {min_free_mb} MB free"}
+    return {"ok": True, "free_mb": free_mb}
+
+def _check_message_queue():
+    global _redis
+    url = current_app.config['REDIS_URL']
+    if not url:
+        return {"ok": True, "detail": "Not configured, sockets are served in-process"}
+    started = time.perf_counter()
+    try:
+        if _redis is None:
+            import redis
+            _redis = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        _redis.ping()
+    except Exception as e:
+        return {"ok": False, "latency_ms": _elapsed_ms(started), "error": str(e)}
+    return {"ok": True, "latency_ms": _elapsed_ms(started)}
+
+def _run_checks():
+    engines = db.engines
+    checks = {"pool": _check_pool(), "database": _check_database(engines[None])}
+    if 'replica' in engines:
+        checks["replica"] = _check_database(engines['replica'])
+    checks["disk"] = _check_disk()
+    checks["message_queue"] = _check_message_queue()
+    return all(check["ok"] for check in checks.values()), checks
+
+def readiness():
+    """Return (ready, checks, checked_at), reusing a result younger than HEALTH_CACHE_SECONDS."""
+    global _cache
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache
+    if cached and cached[0] > now:
+        return cached[1:]
+
+    ready, checks = _run_checks()
+    result = (now + current_app.config['HEALTH_CACHE_SECONDS'], ready, checks,
+              datetime.now(UTC).isoformat())
+    with _cache_lock:
+        _cache = result
+    return result[1:]
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from app import db, socketio
+from app.utils.derivatives import DERIVATIVE_FOLDER, generate_derivatives, remove_derivatives
+from app.utils.file_handler import SNIFF_BYTES, sniff_mime_type
+from app.utils.metrics import QUEUE_DEPTH
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_executor = None
+_completed = queue.Queue()  # (media_id, future) pairs waiting to be applied
+_in_flight = 0
+_lock = threading.Lock()
+
+def _scan_for_viruses(scanner_path, file_path):
+    # clamscan/clamdscan exit with 0 when clean and 1 when a signature matched
+    result = subprocess.run([scanner_path, '--no-summary', file_path],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=120)
+    if result.returncode == 1:
+        return result.stdout.decode(errors='replace').strip() or 'infected'
+    return None
+
+def _image_size(path):
+    if Image is None or not path:
+        return None, None
+    try:
+        with Image.open(path) as image:
+            return image.width, image.height
+    except Exception:
+        return None, None
+
+def process_upload(upload_folder, filename, media_type, sizes, ffmpeg_path=None, scanner_path=None):
+    """Post-upload work for one file. Runs in a worker process.
+
+    Returns a dict describing the file. If the file must not be kept,
+    `rejected` holds the reason and nothing else is filled in.
+    """
+    file_path = os.path.join(upload_folder, filename)
+
+    with open(file_path, 'rb') as f:
+        header = f.read(SNIFF_BYTES)
+        digest = hashlib.sha256(header)
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    mime_type = sniff_mime_type(header)
+    if not mime_type or mime_type.split('/')[0] != media_type:
+        return {"rejected": f"Content does not look like a supported {media_type}"}
+
+    if scanner_path:
+        infection = _scan_for_viruses(scanner_path, file_path)
+        if infection:
+            return {"rejected": f"Virus scan failed: {infection}"}
+
+    variants = generate_derivatives(upload_folder, filename, media_type, sizes, ffmpeg_path)
+    # Videos are measured from their poster frame when one was extracted
+    if media_type == 'image':
+        width, height = _image_size(file_path)
+    elif 'poster' in variants:
+        width, height = _image_size(os.path.join(upload_folder, DERIVATIVE_FOLDER, variants['poster']))
+    else:
+        width, height = None, None
+
+    return {
+        "rejected": None,
+        "file_hash": digest.hexdigest(),
+        "file_size": os.path.getsize(file_path),
+        "width": width,
+        "height": height,
+        "variants": variants
+    }
+
+def _apply_result(media_id, future):
+    from app.models.media import Media
+
+    media = db.session.get(Media, media_id)
+    if not media:
+        return
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    try:
+        result = future.result()
+    except Exception as e:
+        current_app.logger.error(f'Processing failed for media {media_id}: {str(e)}')
+        result = None
+
+    event = {"media_id": media.id}
+    if result is None:
+        media.processing_status = Media.FAILED
+        event["status"] = Media.FAILED
+    elif result["rejected"]:
+        current_app.logger.warning(f'Rejected media {media_id}: {result["rejected"]}')
+        file_path = os.path.join(upload_folder, media.file_path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        db.session.delete(media)
+        event.update(status=Media.REJECTED, reason=result["rejected"])
+    else:
+        media.file_hash = result["file_hash"]
+        media.file_size = result["file_size"]
+        media.width = result["width"]
+        media.height = result["height"]
+        remove_derivatives(upload_folder, media.variants)
+        media.variants = result["variants"]
+        media.processing_status = Media.READY
+        event["status"] = Media.READY
+
+    user_id = media.user_id
+    db.session.commit()
+    socketio.emit('media_processed', event, room=f"user_{user_id}")
+
+def _dispatch_completed(app):
+    global _in_flight
+    while True:
+        # Done callbacks run on the executor's management thread, which the
+        # eventlet worker's monkey patching makes a green thread, so this
+        # blocking get only suspends this task
+        media_id, future = _completed.get()
+        with app.app_context():
+            try:
+                _apply_result(media_id, future)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Could not store processing result for media {media_id}: {str(e)}')
+        with _lock:
+            _in_flight -= 1
+        QUEUE_DEPTH.labels('media').dec()
+
+def _get_executor(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=app.config['MEDIA_WORKER_PROCESSES'])
+            # Results are applied on a socketio background task so DB work and
+            # emits happen in the server's own concurrency model, not the pool's
+            socketio.start_background_task(_dispatch_completed, app)
+        return _executor
+
+def queue_depth():
+    return _in_flight
+
+def enqueue_media_processing(media):
+    """Hand a committed Media row to the worker pool."""
+    global _in_flight
+    app = current_app._get_current_object()
+    args = (
+        app.config['UPLOAD_FOLDER'],
+        media.file_path,
+        media.media_type,
+        app.config['MEDIA_DERIVATIVE_SIZES'],
+        app.config['FFMPEG_PATH'] or shutil.which('ffmpeg'),
+        app.config['VIRUS_SCANNER_PATH'] or shutil.which('clamdscan') or shutil.which('clamscan')
+    )
+    media_id = media.id
+
+    executor = _get_executor(app)
+    with _lock:
+        _in_flight += 1
+    QUEUE_DEPTH.labels('media').inc()
+    try:
+        future = executor.submit(process_upload, *args)
+    except Exception:
+        # Nothing will come back through _completed to undo the count
+        with _lock:
+            _in_flight -= 1
+        QUEUE_DEPTH.labels('media').dec()
+        raise
+    future.add_done_callback(lambda f: _completed.put((media_id, f)))
@@ -0,0 +1,71 @@
+import os
+import time
+from flask import g, request
+from flask_socketio import SocketIO
+from sqlalchemy.event import listen
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# Prometheus metrics for /api/metrics.
+#
+# Values are plain counters updated in place. When PROMETHEUS_MULTIPROC_DIR
+# is set, prometheus_client keeps them in per-process mmap files and a
+# scrape adds up every worker's. gunicorn.conf.py empties the directory when
+# the server starts and marks exited workers dead, so gauges of live things
+# (connections, pool checkouts, queued jobs) count only running processes.
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests handled', ['endpoint', 'method', 'status'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Time to build an HTTP response', ['endpoint', 'method'])
+DB_QUERIES = Counter('db_queries_total', 'SQL statements run by HTTP requests', ['endpoint'])
+DB_QUERY_SECONDS = Counter('db_query_seconds_total', 'Database time spent by HTTP requests', ['endpoint'])
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently in use', ['bind'],
+                            multiprocess_mode='livesum')
+DB_POOL_WAIT = Histogram('db_pool_wait_seconds', 'Time spent waiting for a pooled connection',
+                         buckets=(.001, .005, .01, .05, .1, .5, 1, 2.5, 5, 10))
+DB_POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Requests that got no connection within the pool timeout')
+SOCKET_CONNECTIONS = Gauge('socketio_connections', 'Authenticated Socket.IO connections', multiprocess_mode='livesum')
+SOCKET_EMITS = Counter('socketio_emits_total', 'Socket.IO events emitted', ['event'])
+UPLOAD_BYTES = Counter('upload_bytes_total', 'Bytes of media accepted by uploads', ['media_type'])
+QUEUE_DEPTH = Gauge('background_queue_depth', 'Jobs queued or running on a background worker', ['queue'],
+                    multiprocess_mode='livesum')
+
+_emit_counters = {}  # event -> labelled counter, so hot emits skip the label lookup
+
+def count_emit(event):
+    counter = _emit_counters.get(event)
+    if counter is None:
+        counter = _emit_counters.setdefault(event, SOCKET_EMITS.labels(event))
+    counter.inc()
+
+class MeteredSocketIO(SocketIO):
+    """SocketIO that counts emits. flask_socketio.emit() inside handlers goes through here too."""
+
+    def emit(self, event, *args, **kwargs):
+        count_emit(event)
+        return super().emit(event, *args, **kwargs)
+
+def track_pool_checkouts(engine, bind):
+    gauge = DB_POOL_CHECKED_OUT.labels(bind)
+    listen(engine, 'checkout', lambda *args: gauge.inc())
+    listen(engine, 'checkin', lambda *args: gauge.dec())
+
+def record_request_metrics(response):
+    """after_request hook: request count and latency, plus the request's SQL totals."""
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    if g.get('sql_queries'):
+        DB_QUERIES.labels(endpoint).inc(g.sql_queries)
+        DB_QUERY_SECONDS.labels(endpoint).inc(g.sql_seconds)
+    return response
+
+def render_metrics():
+    """Return (body, content type) for a scrape."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
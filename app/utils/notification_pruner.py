@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, UTC
+from flask import current_app
+from sqlalchemy import delete, func
+from app import db, socketio
+from app.models.notification import Notification
+from app.utils.db_pool import no_statement_timeout
+from app.utils.partitioning import (is_partitioned, ensure_monthly_partitions, drop_partitions_before, months_ago,
+                                    warn_if_unmaintained)
+
+def _delete_ids(ids):
+    db.session.execute(delete(Notification).where(Notification.id.in_(ids))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+def _prune_viewed(older_than_days, batch_size):
+    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=older_than_days)
+    deleted = 0
+    while True:
+        ids = [row_id for (row_id,) in db.session.query(Notification.id).filter(
+            Notification.viewed.is_(True),
+            Notification.updated_at < cutoff
+        ).limit(batch_size)]
+        if not ids:
+            return deleted
+        _delete_ids(ids)
+        deleted += len(ids)
+
+def _prune_over_cap(max_per_user, batch_size):
+    over_cap = [user_id for (user_id,) in db.session.query(Notification.user_id)
+                .group_by(Notification.user_id)
+                .having(func.count(Notification.id) > max_per_user)]
+    deleted = 0
+    for user_id in over_cap:
+        while True:
+            # Everything past the newest max_per_user, read through (user_id, updated_at)
+            ids = [row_id for (row_id,) in db.session.query(Notification.id)
+                   .filter(Notification.user_id == user_id)
+                   .order_by(Notification.updated_at.desc(), Notification.id.desc())
+                   .offset(max_per_user)
+                   .limit(batch_size)]
+            if not ids:
+                break
+            _delete_ids(ids)
+            deleted += len(ids)
+    return deleted
+
+def _maintain_partitions(retention_months):
+    connection = db.session.connection()
+    if not is_partitioned(connection, 'notification'):
+        return []
+    ensure_monthly_partitions(connection, 'notification', datetime.now(UTC).date())
+    dropped = drop_partitions_before(connection, 'notification', months_ago(retention_months)) \
+        if retention_months else []
+    db.session.commit()
+    return dropped
+
+def prune_notifications(max_per_user, viewed_retention_days, batch_size, partition_retention_months=0):
+    """Apply notification retention in bounded chunks, committing after each.
+
+    Viewed notifications untouched for `viewed_retention_days` are deleted,
+    then each user is trimmed to their newest `max_per_user`. On a
+    partitioned Postgres table, upcoming monthly partitions are created and
+    partitions older than `partition_retention_months` are dropped whole.
+    """
+    stats = {'viewed': 0, 'over_cap': 0, 'dropped_partitions': []}
+    if viewed_retention_days:
+        stats['viewed'] = _prune_viewed(viewed_retention_days, batch_size)
+    if max_per_user:
+        stats['over_cap'] = _prune_over_cap(max_per_user, batch_size)
+    stats['dropped_partitions'] = _maintain_partitions(partition_retention_months)
+    current_app.logger.info(f'Notification pruning finished: {stats["viewed"]} viewed and '
+                            f'{stats["over_cap"]} over-cap rows deleted, '
+                            f'{len(stats["dropped_partitions"])} partitions dropped')
+    return stats
+
+def prune_with_config(app):
+    return prune_notifications(
+        app.config['NOTIFICATION_MAX_PER_USER'],
+        app.config['NOTIFICATION_VIEWED_RETENTION_DAYS'],
+        app.config['NOTIFICATION_PRUNE_BATCH_SIZE'],
+        app.config['NOTIFICATION_PARTITION_RETENTION_MONTHS']
+    )
+
+def _run_periodically(app):
+    while True:
+        socketio.sleep(app.config['NOTIFICATION_PRUNE_INTERVAL'])
+        with app.app_context(), no_statement_timeout():
+            try:
+                prune_with_config(app)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Notification pruning failed: {str(e)}')
+
+def start_notification_pruner(app):
+    if app.config['NOTIFICATION_PRUNE_INTERVAL'] > 0:
+        socketio.start_background_task(_run_periodically, app)
+    else:
+        warn_if_unmaintained(app, 'notification', 'NOTIFICATION_PRUNE_INTERVAL', 'prune-notifications')
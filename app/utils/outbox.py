@@ -0,0 +1,31 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+OUTBOX_KEY = 'outbox'
+
+def stage_after_commit(func, *args, **kwargs):
+    """Run func(*args, **kwargs) once the current transaction commits.
+
+    Used for socket emits so clients never hear about work that was rolled
+    back, and so callers keep control of when their transaction commits.
+    Staged calls are dropped if the transaction rolls back or is closed.
+    """
+    db.session.info.setdefault(OUTBOX_KEY, []).append((func, args, kwargs))
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_outbox(session):
+    # Savepoint releases also fire after_commit; only the outer commit publishes
+    if session.in_nested_transaction():
+        return
+    for func, args, kwargs in session.info.pop(OUTBOX_KEY, []):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            current_app.logger.error(f'Outbox dispatch failed: {str(e)}')
+
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_outbox(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(OUTBOX_KEY, None)
@@ -0,0 +1,124 @@
+# Helpers for Postgres tables range-partitioned by month, shared by the
+# partitioning migrations and the background pruners.
+#
+# Partitions are named <table>_pYYYYMM and cover [first of month, first of
+# next month). Each partitioned table also has a <table>_pdefault partition
+# for rows outside the created ranges.
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from app import db
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+def partition_name(table, month):
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+def is_partitioned(connection, table):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+             "WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace"),
+        {"table": table}
+    ).first() is not None
+
+def monthly_partitions(connection, table):
+    """Return [(name, month)] for the table's monthly partitions, oldest first."""
+    rows = connection.execute(
+        text("SELECT c.relname FROM pg_inherits i "
+             "JOIN pg_class c ON c.oid = i.inhrelid "
+             "JOIN pg_class p ON p.oid = i.inhparent "
+             "WHERE p.relname = :table"),
+        {"table": table}
+    )
+    prefix = f"{table}_p"
+    partitions = []
+    for (name,) in rows:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def _partition_key(connection, table):
+    return connection.execute(
+        text("SELECT a.attname FROM pg_partitioned_table pt "
+             "JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0] "
+             "WHERE pt.partrelid = CAST(:table AS regclass)"),
+        {"table": table}
+    ).scalar()
+
+def create_monthly_partition(connection, table, month):
+    """Create the month's partition unless it exists.
+
+    Rows for the month that already landed in the default partition would
+    make a plain CREATE ... PARTITION OF fail, so the default is detached
+    while they move into the new partition and attached again after.
+    """
+    name = partition_name(table, month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": f'public."{name}"'}).scalar():
+        return name
+    default = f"{table}_pdefault"
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    key = _partition_key(connection, table)
+    in_month = f""""{key}" >= '{start}' AND "{key}" < '{end}'"""
+    stranded = connection.execute(text(f'SELECT 1 FROM "{default}" WHERE {in_month} LIMIT 1')).first()
+    if not stranded:
+        connection.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+        return name
+    connection.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+    connection.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM "{default}" WHERE {in_month} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ))
+    connection.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+    return name
+
+def ensure_monthly_partitions(connection, table, start, months_ahead=2):
+    """Create monthly partitions from `start` through `months_ahead` months from today."""
+    month = month_start(start)
+    last = add_months(month_start(date.today()), months_ahead)
+    created = []
+    while month <= last:
+        created.append(create_monthly_partition(connection, table, month))
+        month = add_months(month, 1)
+    return created
+
+def drop_partitions_before(connection, table, cutoff):
+    """Drop monthly partitions that end on or before `cutoff`. Returns their names."""
+    dropped = []
+    for name, month in monthly_partitions(connection, table):
+        if add_months(month, 1) <= cutoff:
+            connection.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+def months_ago(months):
+    return add_months(month_start(date.today()), -months)
+
+def warn_if_unmaintained(app, table, interval_setting, command):
+    """Log at startup when `table` is partitioned but no background task creates its upcoming partitions.
+
+    Without them new rows pile up in the default partition from a couple of
+    months after the partitioning migration.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if app.config[interval_setting] > 0 or not uri or make_url(uri).get_backend_name() != 'postgresql':
+        return
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                partitioned = is_partitioned(connection, table)
+        except Exception as e:
+            app.logger.warning(f'Could not check whether {table} is partitioned: {str(e)}')
+            return
+    if partitioned:
+        app.logger.error(f'{table} is partitioned but {interval_setting} is 0: set it, or run '
+                         f'`flask {command}` at least monthly, or new rows fill {table}_pdefault')
@@ -0,0 +1,168 @@
+import threading
+import time
+from flask import current_app
+from app import socketio
+
+class LocalPresence:
+    """In-process presence registry, for single-worker setups and development.
+
+    Tracks each user's socket connections with an expiry that heartbeats
+    push forward, so a connection that was never cleanly closed drops out
+    after `ttl` seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._connections = {}  # user_id -> {sid: expires_at}
+        self._lock = threading.Lock()
+
+    def connect(self, user_id, sid):
+        with self._lock:
+            self._connections.setdefault(user_id, {})[sid] = time.time() + self.ttl
+
+    def disconnect(self, user_id, sid):
+        with self._lock:
+            sids = self._connections.get(user_id)
+            if sids is not None:
+                sids.pop(sid, None)
+                if not sids:
+                    del self._connections[user_id]
+
+    def heartbeat(self, connections):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for sid, user_id in connections:
+                self._connections.setdefault(user_id, {})[sid] = expires_at
+
+    def connection_counts(self, user_ids):
+        now = time.time()
+        with self._lock:
+            return {user_id: sum(1 for expires_at in self._connections.get(user_id, {}).values()
+                                 if expires_at > now)
+                    for user_id in user_ids}
+
+    def connection_sids(self, user_ids):
+        now = time.time()
+        with self._lock:
+            return {user_id: [sid for sid, expires_at in self._connections.get(user_id, {}).items()
+                              if expires_at > now]
+                    for user_id in user_ids}
+
+class RedisPresence:
+    """Presence registry shared by every worker through Redis.
+
+    Each user has a sorted set of their connection ids scored by expiry
+    time. Expired members are ignored when counting and trimmed on the
+    next write, and the key itself expires once its user goes quiet.
+    """
+
+    KEY = 'presence:user:{}'
+
+    def __init__(self, url, ttl):
+        import redis
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _touch(self, pipe, user_id, sid, now):
+        key = self.KEY.format(user_id)
+        pipe.zadd(key, {sid: now + self.ttl})
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.expire(key, self.ttl)
+
+    def connect(self, user_id, sid):
+        pipe = self._redis.pipeline()
+        self._touch(pipe, user_id, sid, time.time())
+        pipe.execute()
+
+    def disconnect(self, user_id, sid):
+        self._redis.zrem(self.KEY.format(user_id), sid)
+
+    def heartbeat(self, connections):
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        for sid, user_id in connections:
+            self._touch(pipe, user_id, sid, now)
+        pipe.execute()
+
+    def connection_counts(self, user_ids):
+        user_ids = list(user_ids)
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(self.KEY.format(user_id), f'({now}', '+inf')
+        return dict(zip(user_ids, pipe.execute()))
+
+    def connection_sids(self, user_ids):
+        user_ids = list(user_ids)
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zrangebyscore(self.KEY.format(user_id), f'({now}', '+inf')
+        return dict(zip(user_ids, pipe.execute()))
+
+_backend = None
+_local_connections = {}  # sid -> user_id for this worker's sockets, refreshed by the heartbeat
+_local_lock = threading.Lock()
+_heartbeat_started = False
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        ttl = current_app.config['PRESENCE_TTL']
+        url = current_app.config['REDIS_URL']
+        _backend = RedisPresence(url, ttl) if url else LocalPresence(ttl)
+    return _backend
+
+def user_connected(user_id, sid):
+    user_id = int(user_id)
+    with _local_lock:
+        _local_connections[sid] = user_id
+    _get_backend().connect(user_id, sid)
+    _start_heartbeat()
+
+def user_disconnected(sid):
+    with _local_lock:
+        user_id = _local_connections.pop(sid, None)
+    if user_id is not None:
+        _get_backend().disconnect(user_id, sid)
+
+def user_sids(user_ids):
+    """Return {user_id: [sid, ...]} for the users' live connections on every worker."""
+    user_ids = {int(user_id) for user_id in user_ids}
+    if not user_ids:
+        return {}
+    return _get_backend().connection_sids(user_ids)
+
+def is_online(user_id):
+    return online_users([user_id]) != set()
+
+def online_users(user_ids):
+    """Return the subset of `user_ids` with at least one live connection."""
+    user_ids = {int(user_id) for user_id in user_ids}
+    if not user_ids:
+        return set()
+    counts = _get_backend().connection_counts(user_ids)
+    return {user_id for user_id, count in counts.items() if count}
+
+def _heartbeat_loop(app):
+    while True:
+        socketio.sleep(app.config['PRESENCE_HEARTBEAT_INTERVAL'])
+        with _local_lock:
+            connections = list(_local_connections.items())
+        if not connections:
+            continue
+        with app.app_context():
+            try:
+                _get_backend().heartbeat(connections)
+            except Exception as e:
+                app.logger.error(f'Presence heartbeat failed: {str(e)}')
+
+def _start_heartbeat():
+    """Start the heartbeat with the worker's first socket, so CLI commands and tests never run it."""
+    global _heartbeat_started
+    app = current_app._get_current_object()
+    with _local_lock:
+        if _heartbeat_started or app.config['PRESENCE_HEARTBEAT_INTERVAL'] <= 0:
+            return
+        _heartbeat_started = True
+    socketio.start_background_task(_heartbeat_loop, app)
@@ -0,0 +1,78 @@
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+# Per-request SQL accounting. Every statement run on the app's engines is
+# timed; HTTP requests add up their statement count and database time, report
+# them in a Server-Timing header and are checked against the view's
+# @query_budget. Slow statements are logged without their parameters.
+
+_endpoint_stats = {}  # endpoint -> [requests, queries, db seconds]
+_stats_lock = threading.Lock()
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def query_budget(max_queries):
+    """Declare how many SQL statements a view may run in one request."""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+    if not has_app_context():
+        return
+    threshold = current_app.config['SQL_SLOW_QUERY_MS']
+    if threshold > 0 and elapsed * 1000 >= threshold:
+        where = request.endpoint if has_request_context() else 'background'
+        redacted = f"{len(parameters)} parameter sets" if executemany else f"{len(parameters or ())} parameters"
+        current_app.logger.warning(f"Slow query in {where} ({elapsed * 1000:.0f} ms, {redacted} redacted): "
+                                   f"{' '.join(statement.split())}")
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+def record_request_queries(response):
+    """after_request hook: aggregate the request's queries, add Server-Timing and enforce the budget."""
+    queries = g.get('sql_queries', 0)
+    db_seconds = g.get('sql_seconds', 0.0)
+    endpoint = request.endpoint or 'unmatched'
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(endpoint, [0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += queries
+        stats[2] += db_seconds
+
+    if current_app.config['SERVER_TIMING_HEADER']:
+        total_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+        response.headers.add('Server-Timing', f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+
+    budget = getattr(current_app.view_functions.get(request.endpoint), 'query_budget', None)
+    if budget is not None and queries > budget:
+        message = f'{endpoint} ran {queries} SQL statements, over its budget of {budget}'
+        if current_app.config['SQL_QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+def endpoint_query_stats():
+    """{endpoint: {'requests', 'queries', 'db_seconds'}} since the worker started."""
+    with _stats_lock:
+        return {endpoint: {'requests': requests, 'queries': queries, 'db_seconds': db_seconds}
+                for endpoint, (requests, queries, db_seconds) in _endpoint_stats.items()}
@@ -0,0 +1,97 @@
+import random
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.media import Reaction, ReactionCounter
+
+def _insert(table):
+    # INSERT ... ON CONFLICT is spelled the same way by both dialects we run on
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'Reaction counters do not support {dialect}')
+    return insert(table)
+
+def _upsert_counter(stmt):
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['media_id', 'reaction_type', 'shard'],
+        set_={'count': ReactionCounter.__table__.c.count + stmt.excluded.count}
+    )
+    db.session.execute(stmt)
+
+def _bump_counter(media_id, reaction_type, delta):
+    shard = random.randrange(current_app.config['REACTION_COUNTER_SHARDS'])
+    _upsert_counter(_insert(ReactionCounter.__table__).values(
+        media_id=media_id, reaction_type=reaction_type, shard=shard, count=delta
+    ))
+
+def add_reaction(user_id, media_id, reaction_type):
+    """Record a reaction. Returns False if the user already had it."""
+    try:
+        with db.session.begin_nested():
+            db.session.add(Reaction(user_id=user_id, media_id=media_id, reaction_type=reaction_type))
+    except IntegrityError:
+        return False
+    _bump_counter(media_id, reaction_type, 1)
+    return True
+
+def remove_reaction(user_id, media_id, reaction_type):
+    """Delete a reaction. Returns False if the user did not have it."""
+    result = db.session.execute(
+        delete(Reaction).where(
+            Reaction.user_id == user_id,
+            Reaction.media_id == media_id,
+            Reaction.reaction_type == reaction_type
+        ).execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return False
+    _bump_counter(media_id, reaction_type, -1)
+    return True
+
+def uncount_reactions(scope):
+    """Subtract the reactions matching `scope` from the counters, before deleting them."""
+    _upsert_counter(_insert(ReactionCounter.__table__).from_select(
+        ['media_id', 'reaction_type', 'shard', 'count'],
+        select(Reaction.media_id, Reaction.reaction_type, literal(0), -func.count(Reaction.id))
+        .where(scope)
+        .group_by(Reaction.media_id, Reaction.reaction_type)
+    ))
+
+def delete_media_reactions(media_ids):
+    db.session.execute(delete(Reaction).where(Reaction.media_id.in_(media_ids))
+                       .execution_options(synchronize_session=False))
+    db.session.execute(delete(ReactionCounter).where(ReactionCounter.media_id.in_(media_ids))
+                       .execution_options(synchronize_session=False))
+
+def reaction_counts(media_ids):
+    """Return {media_id: {reaction_type: total}} for a page of media in one query."""
+    counts = defaultdict(dict)
+    if not media_ids:
+        return counts
+    rows = db.session.query(
+        ReactionCounter.media_id,
+        ReactionCounter.reaction_type,
+        func.sum(ReactionCounter.count)
+    ).filter(ReactionCounter.media_id.in_(media_ids))\
+        .group_by(ReactionCounter.media_id, ReactionCounter.reaction_type)
+    for media_id, reaction_type, total in rows:
+        if total:
+            counts[media_id][reaction_type] = int(total)
+    return counts
+
+def viewer_reactions(user_id, media_ids):
+    """Return {media_id: [reaction_type, ...]} for the viewer's reactions on a page of media."""
+    reactions = defaultdict(list)
+    if not media_ids:
+        return reactions
+    rows = db.session.query(Reaction.media_id, Reaction.reaction_type)\
+        .filter(Reaction.user_id == user_id, Reaction.media_id.in_(media_ids))
+    for media_id, reaction_type in rows:
+        reactions[media_id].append(reaction_type)
+    return reactions
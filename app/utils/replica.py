@@ -0,0 +1,58 @@
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+# Read-replica routing. Handlers wrapped in @replica_reads send their
+# SELECTs to the 'replica' bind when DATABASE_REPLICA_URL is set; writes,
+# and everything outside those handlers, stay on the primary. After a user's
+# own write, a short-lived cookie keeps their reads on the primary until the
+# replica has had time to catch up.
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'primary_reads_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def _is_read(clause):
+    if clause is None:
+        return True
+    return not getattr(clause, 'is_dml', False) and getattr(clause, '_for_update_arg', None) is None
+
+class RoutingSession(Session):
+    """db.session class that picks the replica for reads inside @replica_reads handlers.
+
+    Once the session writes during a request, the rest of that request reads
+    from the primary too, so it sees its own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                if not self._flushing and _is_read(clause):
+                    return engine
+                g.use_replica = False
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _pinned_to_primary():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def replica_reads(f):
+    """Serve the handler's reads from the replica unless the caller wrote recently."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_replica = not _pinned_to_primary()
+        return f(*args, **kwargs)
+    return decorated_function
+
+def pin_reads_after_write(response):
+    """after_request hook: keep a client on the primary for a while after a successful write."""
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+        response.set_cookie(STICKY_COOKIE, str(int(time.time()) + sticky_seconds),
+                            max_age=sticky_seconds, httponly=True, samesite='Lax',
+                            secure=current_app.config['JWT_COOKIE_SECURE'])
+    return response
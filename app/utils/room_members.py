@@ -0,0 +1,68 @@
+import threading
+import time
+from flask import current_app
+from app import db, socketio
+from app.models.chat import UserChatAssociation
+from app.utils.presence import user_sids
+
+_cache = {}  # room_id -> (expires_at, frozenset of member user ids)
+_lock = threading.Lock()
+
+def room_members(room_id):
+    """Return the member ids of a chat room, cached for CHAT_MEMBERS_CACHE_TTL seconds.
+
+    Membership is read from the association table. Changes made by this
+    worker invalidate the entry straight away; other workers pick them up
+    when their entry expires.
+    """
+    room_id = int(room_id)
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(room_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    members = frozenset(user_id for (user_id,) in db.session.query(UserChatAssociation.user_id)
+                        .filter(UserChatAssociation.chat_room_id == room_id))
+    with _lock:
+        if len(_cache) >= current_app.config['CHAT_MEMBERS_CACHE_SIZE']:
+            _cache.clear()
+        _cache[room_id] = (now + current_app.config['CHAT_MEMBERS_CACHE_TTL'], members)
+    return members
+
+def invalidate_room_members(*room_ids):
+    with _lock:
+        for room_id in room_ids:
+            _cache.pop(int(room_id), None)
+
+def user_room_ids(user_id):
+    return [room_id for (room_id,) in db.session.query(UserChatAssociation.chat_room_id)
+            .filter(UserChatAssociation.user_id == user_id)]
+
+def room_channel(room_id):
+    return f"chat_{room_id}"
+
+def sync_room_channel(room_id, added=(), removed=()):
+    """Move members' sockets in and out of a room's channel after a membership change.
+
+    Sockets are found through the presence registry. With a message queue
+    configured, Socket.IO forwards joins and leaves for sockets held by
+    other workers. Each affected member is also sent `chat_rooms_changed`
+    so their clients refresh the room list, and can send `join_chat` for
+    any socket the registry missed.
+    """
+    channel = room_channel(room_id)
+    sids = user_sids(set(added) | set(removed))
+    for user_id in added:
+        for sid in sids.get(int(user_id), []):
+            try:
+                socketio.server.enter_room(sid, channel, namespace='/')
+            except KeyError:
+                pass  # Disconnected since the lookup
+    for user_id in removed:
+        for sid in sids.get(int(user_id), []):
+            socketio.server.leave_room(sid, channel, namespace='/')
+    for user_id in added:
+        socketio.emit('chat_rooms_changed', {'room_id': int(room_id)}, room=f"user_{user_id}")
+    for user_id in removed:
+        socketio.emit('chat_rooms_changed', {'room_id': int(room_id), 'removed': True}, room=f"user_{user_id}")
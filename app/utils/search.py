@@ -0,0 +1,84 @@
+from sqlalchemy import DDL, and_, event, literal_column, text
+from app import db
+from app.models.user import User
+from app.models.media import Comment
+from app.models.chat import ChatMessage, UserChatAssociation
+
+# Full-text search over chat messages and comments.
+#
+# Postgres matches against a GIN expression index on to_tsvector(content).
+# SQLite, used for local runs, keeps an external-content FTS5 table per
+# source table, <table>_fts, filled by triggers. Either way the index is
+# updated by the same statement that writes the row.
+
+TS_CONFIG = 'simple'  # No stemming or stop words; chat is full of names, tags and slang
+MAX_QUERY_LENGTH = 200
+
+def postgres_index_ddl(table):
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_content_fts ON {table} "
+        f"USING gin (to_tsvector('{TS_CONFIG}'::regconfig, content))"
+    ]
+
+def sqlite_fts_ddl(table):
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+    ]
+
+# Tables built with db.create_all() get their search index too
+for _model in (ChatMessage, Comment):
+    for _statement in postgres_index_ddl(_model.__tablename__):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+    for _statement in sqlite_fts_ddl(_model.__tablename__):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+def _fts5_query(query_text):
+    # Quote every term so user input can't use FTS5 query syntax; terms are ANDed
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query_text.split())
+
+def _matches(model, query_text):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Spelled exactly like the index expression so the planner can use it
+        vector = db.func.to_tsvector(literal_column(f"'{TS_CONFIG}'::regconfig"), model.content)
+        return vector.op('@@')(db.func.websearch_to_tsquery(literal_column(f"'{TS_CONFIG}'::regconfig"), query_text))
+    if dialect == 'sqlite':
+        fts = f"{model.__tablename__}_fts"
+        return model.id.in_(text(f"SELECT rowid FROM {fts} WHERE {fts} MATCH :fts_query")
+                            .bindparams(fts_query=_fts5_query(query_text))
+                            .columns(rowid=db.Integer))
+    raise RuntimeError(f'Search does not support {dialect}')
+
+def search_messages(user_id, query_text, room_id=None, before=None, limit=20):
+    """Return [(ChatMessage, sender username)] matching the query in the user's rooms, newest first."""
+    query = db.session.query(ChatMessage, User.username)\
+        .join(User, User.id == ChatMessage.sender_id)\
+        .join(UserChatAssociation, and_(
+            UserChatAssociation.chat_room_id == ChatMessage.room_id,
+            UserChatAssociation.user_id == user_id
+        ))\
+        .filter(_matches(ChatMessage, query_text))
+    if room_id is not None:
+        query = query.filter(ChatMessage.room_id == room_id)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    return query.order_by(ChatMessage.id.desc()).limit(limit).all()
+
+def search_comments(query_text, media_id=None, before=None, limit=20):
+    """Return [(Comment, author username)] matching the query, newest first."""
+    query = db.session.query(Comment, User.username)\
+        .join(User, User.id == Comment.user_id)\
+        .filter(_matches(Comment, query_text))
+    if media_id is not None:
+        query = query.filter(Comment.media_id == media_id)
+    if before is not None:
+        query = query.filter(Comment.id < before)
+    return query.order_by(Comment.id.desc()).limit(limit).all()
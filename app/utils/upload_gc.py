@@ -0,0 +1,132 @@
+import os
+import time
+from flask import current_app
+from app import db, socketio
+from app.utils.db_pool import no_statement_timeout
+from app.utils.derivatives import DERIVATIVE_FOLDER, source_filename
+
+MAX_REPORTED_IDS = 100  # Cap on media ids kept for the report
+
+def _scan_batches(folder, batch_size):
+    # os.scandir streams directory entries, so only one batch is held at a time
+    if not os.path.isdir(folder):
+        return
+    batch = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def _is_stale(entry, cutoff):
+    try:
+        return entry.stat(follow_symlinks=False).st_mtime < cutoff
+    except FileNotFoundError:
+        return False
+
+def _remove(entry, delete, stats, logger):
+    try:
+        size = entry.stat(follow_symlinks=False).st_size
+    except FileNotFoundError:
+        return
+    stats['orphan_files'] += 1
+    stats['orphan_bytes'] += size
+    if not delete:
+        logger.info(f'Orphaned upload: {entry.path}')
+        return
+    try:
+        os.remove(entry.path)
+        stats['deleted_files'] += 1
+    except FileNotFoundError:
+        pass
+
+def collect_orphans(upload_folder, batch_size=1000, grace_seconds=3600, delete=False):
+    """Reconcile UPLOAD_FOLDER with the media table.
+
+    Files with no Media row (or derivatives no longer referenced by their
+    row) are reported, and removed when `delete` is set. Media rows whose
+    file is gone are only reported. Files younger than `grace_seconds` are
+    skipped because their upload may not have been committed yet.
+    """
+    from app.models.media import Media
+
+    logger = current_app.logger
+    cutoff = time.time() - grace_seconds
+    stats = {
+        'scanned_files': 0,
+        'orphan_files': 0,
+        'orphan_bytes': 0,
+        'deleted_files': 0,
+        'missing_files': 0,
+        'missing_media_ids': []
+    }
+
+    # Uploads without a row
+    for batch in _scan_batches(upload_folder, batch_size):
+        stats['scanned_files'] += len(batch)
+        names = [entry.name for entry in batch]
+        known = {path for (path,) in db.session.query(Media.file_path).filter(Media.file_path.in_(names))}
+        for entry in batch:
+            if entry.name not in known and _is_stale(entry, cutoff):
+                _remove(entry, delete, stats, logger)
+        db.session.rollback()  # Don't keep a transaction open across batches
+
+    # Derivatives whose upload is gone or which were replaced
+    for batch in _scan_batches(os.path.join(upload_folder, DERIVATIVE_FOLDER), batch_size):
+        stats['scanned_files'] += len(batch)
+        sources = {source_filename(entry.name) for entry in batch}
+        referenced = set()
+        for (variants,) in db.session.query(Media.variants).filter(Media.file_path.in_(sources)):
+            referenced.update((variants or {}).values())
+        for entry in batch:
+            if entry.name not in referenced and _is_stale(entry, cutoff):
+                _remove(entry, delete, stats, logger)
+        db.session.rollback()
+
+    # Rows without a file, walked in id order so each chunk is one indexed range scan
+    last_id = 0
+    while True:
+        rows = db.session.query(Media.id, Media.file_path)\
+            .filter(Media.id > last_id)\
+            .order_by(Media.id)\
+            .limit(batch_size)\
+            .all()
+        db.session.rollback()
+        if not rows:
+            break
+        for media_id, path in rows:
+            if not path or not os.path.exists(os.path.join(upload_folder, path)):
+                stats['missing_files'] += 1
+                if len(stats['missing_media_ids']) < MAX_REPORTED_IDS:
+                    stats['missing_media_ids'].append(media_id)
+        last_id = rows[-1][0]
+
+    logger.info(f'Upload GC finished: {stats["scanned_files"]} files scanned, '
+                f'{stats["orphan_files"]} orphaned ({stats["orphan_bytes"]} bytes), '
+                f'{stats["deleted_files"]} deleted, {stats["missing_files"]} media rows without a file')
+    return stats
+
+def _run_periodically(app):
+    interval = app.config['UPLOAD_GC_INTERVAL']
+    while True:
+        socketio.sleep(interval)
+        with app.app_context(), no_statement_timeout():
+            try:
+                collect_orphans(
+                    app.config['UPLOAD_FOLDER'],
+                    batch_size=app.config['UPLOAD_GC_BATCH_SIZE'],
+                    grace_seconds=app.config['UPLOAD_GC_GRACE_SECONDS'],
+                    delete=True
+                )
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Upload GC failed: {str(e)}')
+
+def start_upload_gc(app):
+    if app.config['UPLOAD_GC_INTERVAL'] > 0:
+        socketio.start_background_task(_run_periodically, app)
@@ -0,0 +1,57 @@
+import os
+import statistics
+import tempfile
+import time
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from app import create_app, db
+from app.config import Config
+from app.models.user import User
+
+# Shared setup for the scripts in this folder. Run them from the repository
+# root, e.g. `python -m benchmarks.viral_post`. DATABASE_URL picks the
+# database as it does for the app, defaulting to a throwaway SQLite file.
+# Scripts create the tables they need and leave their rows behind, so point
+# them at a scratch database.
+
+def make_app(config_class=Config, **overrides):
+    """create_app() with background tasks off and `overrides` applied as config."""
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL') or
+            'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db'),
+        'UPLOAD_FOLDER': tempfile.mkdtemp(),
+        'PRESENCE_HEARTBEAT_INTERVAL': 0,
+        'REDIS_URL': None,
+        'SQL_SLOW_QUERY_MS': 0,  # Load tests make slow queries on purpose
+        **overrides,
+    }
+    app = create_app(type('BenchmarkConfig', (config_class,), settings))
+    with app.app_context():
+        db.create_all()
+    return app
+
+def create_users(count, prefix):
+    """Insert `count` users in one statement and return their ids. Needs an app context."""
+    prefix = f'{prefix}{os.urandom(3).hex()}_'
+    rows = db.session.execute(insert(User).returning(User.id), [
+        {'email': f'{prefix}{i}@example.com', 'username': f'{prefix}{i}', 'password_hash': 'x'}
+        for i in range(count)
+    ]).scalars().all()
+    db.session.commit()
+    return rows
+
+def auth_headers(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def summarize(label, seconds):
+    """Print count, throughput and latency percentiles for a list of per-operation timings."""
+    ordered = sorted(seconds)
+    total = sum(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f'{label}: {len(ordered)} ops, {len(ordered) / total:,.0f} ops/s serial, '
+          f'p50 {statistics.median(ordered) * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms')
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
@@ -0,0 +1,96 @@
+"""Micro-benchmark: per-request ORM overhead, default profile versus ProductionConfig.
+
+"before" turns SQLALCHEMY_TRACK_MODIFICATIONS back on and keeps
+expire_on_commit, as the app ran before; "after" is ProductionConfig (no
+modification tracking, no expiry on commit). Each profile gets its own app
+and database, then makes --requests calls each to POST
+/api/chat/send-message, POST /api/media/<id>/comments and GET
+/api/chat/my-rooms. Reported per endpoint: median request time and SQL
+statements per request.
+
+    python -m benchmarks.orm_overhead --requests 1000
+
+Measured on a 1-vCPU VM with SQLite, two runs:
+
+    send-message  before p50 4.3 ms, 6 statements   after p50 4.2 ms, 6 statements
+    add-comment   before p50 4.8 ms, 8 statements   after p50 4.0 ms, 6 statements
+    my-rooms      before p50 2.1 ms, 2 statements   after p50 2.1 ms, 2 statements
+
+add_comment builds its response from rows it committed. With expiry on,
+it reloads the comment and the current user, which costs two SELECTs and
+about 16% of the request. send_message builds its payload before
+committing, and read-only requests never commit, so neither changes.
+Modification tracking on its own is within noise at this request size.
+"""
+import argparse
+import statistics
+import time
+from app import db
+from app.config import Config, ProductionConfig
+from app.models.chat import ChatRoom, UserChatAssociation
+from app.models.media import Media
+from app.utils.query_stats import endpoint_query_stats
+from benchmarks.common import make_app, create_users, auth_headers
+
+PROFILES = {
+    'before': (Config, {'SQLALCHEMY_TRACK_MODIFICATIONS': True, 'SQLALCHEMY_EXPIRE_ON_COMMIT': True}),
+    'after': (ProductionConfig, {'SQLALCHEMY_EXPIRE_ON_COMMIT': False}),
+}
+
+ENDPOINTS = {'send-message': 'chat.send_message', 'add-comment': 'media.add_comment', 'my-rooms': 'chat.get_my_rooms'}
+
+def run_profile(config_class, overrides, requests):
+    app = make_app(config_class, METRICS_TOKEN='benchmark', **overrides)
+    with app.app_context():
+        user_ids = create_users(3, 'orm')
+        room = ChatRoom(name='orm', is_group=True)
+        db.session.add(room)
+        db.session.flush()
+        db.session.add_all(UserChatAssociation(user_id=user_id, chat_room_id=room.id) for user_id in user_ids)
+        media = Media(user_id=user_ids[1], media_type='image', file_path='orm.png', processing_status='ready')
+        db.session.add(media)
+        db.session.commit()
+        room_id, media_id = room.id, media.id
+        headers = auth_headers(user_ids[0])
+
+    client = app.test_client()
+    timings = {'send-message': [], 'add-comment': [], 'my-rooms': []}
+    before = endpoint_query_stats()
+    for i in range(requests):
+        started = time.perf_counter()
+        response = client.post('/api/chat/send-message', json={'room_id': room_id, 'content': f'message {i}'},
+                               headers=headers)
+        timings['send-message'].append(time.perf_counter() - started)
+        assert response.status_code == 201
+
+        started = time.perf_counter()
+        response = client.post(f'/api/media/{media_id}/comments', json={'content': f'comment {i}'}, headers=headers)
+        timings['add-comment'].append(time.perf_counter() - started)
+        assert response.status_code == 201
+
+        started = time.perf_counter()
+        response = client.get('/api/chat/my-rooms', headers=headers)
+        timings['my-rooms'].append(time.perf_counter() - started)
+        assert response.status_code == 200
+
+    after = endpoint_query_stats()
+    statements = {}
+    for label, endpoint in ENDPOINTS.items():
+        queries = after[endpoint]['queries'] - before.get(endpoint, {}).get('queries', 0)
+        statements[label] = queries / requests
+    return {label: (statistics.median(values) * 1000, statements[label]) for label, values in timings.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {name: run_profile(config_class, overrides, args.requests)
+               for name, (config_class, overrides) in PROFILES.items()}
+    for label in ENDPOINTS:
+        line = '    '.join(f'{name} p50 {results[name][label][0]:.2f} ms, {results[name][label][1]:.0f} statements'
+                           for name in PROFILES)
+        print(f'{label:13} {line}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Load test: database pool size against eventlet worker-connections.
+
+Starts the app under gunicorn the way docker/Dockerfile does (one eventlet
+worker, 1000 worker-connections), once per pool setting, and keeps
+--clients concurrent keep-alive clients on GET /api/chat/my-rooms for
+--seconds. Reports throughput, latency percentiles and how many requests
+got a 503 because no connection came free within DB_POOL_TIMEOUT.
+
+    DATABASE_URL=postgresql://.../scratch python -m benchmarks.pool_load --clients 200 --pools 5+0 10+10 40+20
+
+Pool settings are DB_POOL_SIZE+DB_MAX_OVERFLOW. Needs gunicorn, eventlet
+and psycogreen from requirements.txt.
+
+Measured on a 1-vCPU VM with Postgres 16, the load generator and the
+server sharing that CPU, 20 s per run, DB_POOL_TIMEOUT=10:
+
+    200 clients
+    pool 5+0     198 req/s, p50 29 ms, p99 7.7 s, 5 x 503
+    pool 10+10   189 req/s, p50 116 ms, p99 10.0 s, 26 x 503
+    pool 40+20   211 req/s, p50 302 ms, p99 10.1 s, 33 x 503
+
+    50 clients
+    pool 5+0     224 req/s, p50 24 ms, p99 1.7 s, no 503s
+    pool 10+10   219 req/s, p50 94 ms, p99 1.6 s, no 503s
+    pool 40+20   215 req/s, p50 219 ms, p99 0.7 s, no 503s
+
+On one CPU throughput stays flat whatever the pool size: psycopg2 is made
+green, so a few connections keep the CPU busy. A larger pool only lets
+more requests interleave, which raises the median. A small pool queues
+them instead. That queue is not first-come-first-served, so under overload
+the slowest waiters reach DB_POOL_TIMEOUT and get a fast 503 rather than
+hanging until gunicorn's timeout.
+
+On real hardware, queries that wait on the database rather than the CPU
+need about (requests/s x seconds per query) connections. Examples are slow
+plans, remote databases and lock waits. Set DB_POOL_SIZE to that and use
+DB_MAX_OVERFLOW for bursts. Keep (pool_size + max_overflow) x workers below
+Postgres max_connections.
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from app import db
+from app.models.chat import ChatRoom, UserChatAssociation
+from benchmarks.common import make_app, create_users, auth_headers
+
+PORT = 10077
+
+def seed():
+    app = make_app()
+    with app.app_context():
+        user_ids = create_users(20, 'pooled')
+        for i in range(20):
+            room = ChatRoom(name=f'pool room {i}', is_group=True)
+            db.session.add(room)
+            db.session.flush()
+            db.session.add_all(UserChatAssociation(user_id=user_id, chat_room_id=room.id) for user_id in user_ids)
+        db.session.commit()
+        return auth_headers(user_ids[0])
+
+def start_server(pool_size, max_overflow):
+    env = dict(os.environ, FLASK_ENV='production', METRICS_TOKEN='benchmark', DB_POOL_SIZE=str(pool_size),
+               DB_MAX_OVERFLOW=str(max_overflow), PRESENCE_HEARTBEAT_INTERVAL='0', SQL_SLOW_QUERY_MS='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--worker-connections', '1000',
+         '--workers', '1', '--bind', f'127.0.0.1:{PORT}', '--log-level', 'warning', 'run:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
+
+def run_clients(headers, clients, seconds):
+    latencies, statuses, lock = [], {}, threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', '/api/chat/my-rooms', headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+                status = 'error'
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--pools', nargs='+', default=['5+0', '10+10', '40+20'])
+    args = parser.parse_args()
+    if not (os.environ.get('DATABASE_URL') or '').startswith('postgresql'):
+        parser.error('set DATABASE_URL to a scratch Postgres database')
+
+    headers = seed()
+    for pool in args.pools:
+        pool_size, max_overflow = (int(part) for part in pool.split('+'))
+        server = start_server(pool_size, max_overflow)
+        try:
+            latencies, statuses = run_clients(headers, args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+        ordered = sorted(latencies)
+        p99 = ordered[int(len(ordered) * 0.99)]
+        print(f'pool {pool:>6}: {len(ordered) / args.seconds:,.0f} req/s, '
+              f'p50 {statistics.median(ordered) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, '
+              f'503s {statuses.get(503, 0)}, statuses {statuses}')
+
+if __name__ == '__main__':
+    main()
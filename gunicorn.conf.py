@@ -0,0 +1,19 @@
+import os
+import shutil
+
+# Server hooks for gunicorn (--config gunicorn.conf.py). Keeps the
+# multiprocess metrics in PROMETHEUS_MULTIPROC_DIR in step with the workers
+# that are actually running; see app/utils/metrics.py.
+
+def on_starting(server):
+    """Drop metric files left by a previous run of the server."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    """Stop counting a dead worker's live gauges (connections, pool checkouts, queued jobs)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,121 @@
+"""optionally partition chat_message by month
+
+Revision ID: 0d7e2a9c4b58
+Revises: f1a4c8e2b6d3
+Create Date: 2026-10-19 16:48:21.904716
+
+Postgres only, and only when PARTITION_CHAT_MESSAGES=1 is set while
+upgrading. The table is rebuilt as a RANGE (timestamp) partitioned table
+with monthly partitions, so `flask archive-chat` and the chat archiver can
+drop whole months after exporting them. Unique keys on a partitioned table
+must contain the partition key, so client_msg_id uniqueness becomes
+(sender_id, client_msg_id, timestamp) and duplicates are caught by the
+lookup in send_message, which holds an advisory lock on the sender and
+client_msg_id so concurrent retries can't both pass it. On other setups this revision does nothing.
+
+"""
+import os
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.partitioning import is_partitioned, ensure_monthly_partitions
+
+
+# revision identifiers, used by Alembic.
+revision = '0d7e2a9c4b58'
+down_revision = 'f1a4c8e2b6d3'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, room_id, sender_id, content, timestamp, client_msg_id'
+
+
+def _create_indexes():
+    op.execute('CREATE INDEX ix_chat_message_room_id_id ON chat_message (room_id, id)')
+
+
+def _drop_indexes():
+    op.execute('DROP INDEX IF EXISTS ix_chat_message_room_id_id')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or os.environ.get('PARTITION_CHAT_MESSAGES') != '1':
+        return
+    if is_partitioned(bind, 'chat_message'):
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE chat_message RENAME TO chat_message_unpartitioned')
+    for constraint in ('chat_message_pkey', 'chat_message_room_id_fkey', 'chat_message_sender_id_fkey',
+                       'uq_chat_message_sender_client_msg_id'):
+        op.execute(f'ALTER TABLE chat_message_unpartitioned RENAME CONSTRAINT {constraint} '
+                   f'TO {constraint.replace("chat_message", "chat_message_unpartitioned", 1)}')
+
+    # The partition key has to be part of the primary key and of every unique key
+    op.execute("""
+        CREATE TABLE chat_message (
+            id INTEGER NOT NULL DEFAULT nextval('chat_message_id_seq'),
+            room_id INTEGER NOT NULL,
+            sender_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            client_msg_id VARCHAR(64),
+            CONSTRAINT chat_message_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT chat_message_room_id_fkey FOREIGN KEY (room_id) REFERENCES chat_room (id),
+            CONSTRAINT chat_message_sender_id_fkey FOREIGN KEY (sender_id) REFERENCES "user" (id),
+            CONSTRAINT uq_chat_message_sender_client_msg_id UNIQUE (sender_id, client_msg_id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute('CREATE TABLE chat_message_pdefault PARTITION OF chat_message DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min(timestamp) FROM chat_message_unpartitioned')).scalar()
+    ensure_monthly_partitions(bind, 'chat_message', oldest.date() if oldest else date.today())
+
+    op.execute(f"""
+        INSERT INTO chat_message ({COLUMNS})
+        SELECT id, room_id, sender_id, content, COALESCE(timestamp, CURRENT_TIMESTAMP), client_msg_id
+        FROM chat_message_unpartitioned
+    """)
+    op.execute('ALTER SEQUENCE chat_message_id_seq OWNED BY chat_message.id')
+    op.execute('DROP TABLE chat_message_unpartitioned')
+    _create_indexes()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not is_partitioned(bind, 'chat_message'):
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE chat_message RENAME TO chat_message_partitioned')
+    for constraint in ('chat_message_pkey', 'chat_message_room_id_fkey', 'chat_message_sender_id_fkey',
+                       'uq_chat_message_sender_client_msg_id'):
+        op.execute(f'ALTER TABLE chat_message_partitioned RENAME CONSTRAINT {constraint} '
+                   f'TO {constraint.replace("chat_message", "chat_message_partitioned", 1)}')
+
+    op.execute("""
+        CREATE TABLE chat_message (
+            id INTEGER NOT NULL DEFAULT nextval('chat_message_id_seq'),
+            room_id INTEGER NOT NULL,
+            sender_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            client_msg_id VARCHAR(64),
+            CONSTRAINT chat_message_pkey PRIMARY KEY (id),
+            CONSTRAINT chat_message_room_id_fkey FOREIGN KEY (room_id) REFERENCES chat_room (id),
+            CONSTRAINT chat_message_sender_id_fkey FOREIGN KEY (sender_id) REFERENCES "user" (id),
+            CONSTRAINT uq_chat_message_sender_client_msg_id UNIQUE (sender_id, client_msg_id)
+        )
+    """)
+    # Retries that slipped past the lookup would break the restored unique key; keep the first
+    op.execute(f"""
+        INSERT INTO chat_message ({COLUMNS})
+        SELECT DISTINCT ON (sender_id, COALESCE(client_msg_id, id::text)) {COLUMNS}
+        FROM chat_message_partitioned
+        ORDER BY sender_id, COALESCE(client_msg_id, id::text), id
+    """)
+    op.execute('ALTER SEQUENCE chat_message_id_seq OWNED BY chat_message.id')
+    op.execute('DROP TABLE chat_message_partitioned')
+    _create_indexes()
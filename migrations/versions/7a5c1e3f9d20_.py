@@ -0,0 +1,48 @@
+"""add full-text search indexes
+
+Revision ID: 7a5c1e3f9d20
+Revises: 0d7e2a9c4b58
+Create Date: 2026-10-19 17:26:45.381057
+
+Postgres gets GIN expression indexes on to_tsvector(content). SQLite gets
+external-content FTS5 tables kept current by triggers, rebuilt here from
+the existing rows. The statements are shared with db.create_all() through
+app.utils.search.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.search import postgres_index_ddl, sqlite_fts_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = '7a5c1e3f9d20'
+down_revision = '0d7e2a9c4b58'
+branch_labels = None
+depends_on = None
+
+TABLES = ('chat_message', 'comment')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == 'postgresql':
+            for statement in postgres_index_ddl(table):
+                op.execute(statement)
+        elif dialect == 'sqlite':
+            for statement in sqlite_fts_ddl(table):
+                op.execute(statement)
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_content_fts')
+        elif dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
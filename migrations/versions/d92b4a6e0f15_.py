@@ -0,0 +1,107 @@
+"""optionally partition notification by month
+
+Revision ID: d92b4a6e0f15
+Revises: c4e1f7a2d938
+Create Date: 2026-10-19 14:58:12.731904
+
+Postgres only, and only when PARTITION_NOTIFICATIONS=1 is set while
+upgrading. The table is rebuilt as a RANGE (created_at) partitioned table
+with monthly partitions, so the notification pruner can drop old months
+with NOTIFICATION_PARTITION_RETENTION_MONTHS instead of deleting rows.
+On other setups this revision does nothing.
+
+"""
+import os
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.partitioning import is_partitioned, ensure_monthly_partitions
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92b4a6e0f15'
+down_revision = 'c4e1f7a2d938'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, user_id, notification_type, viewed, data, group_key, count, created_at, updated_at'
+
+
+def _create_indexes():
+    op.execute('CREATE INDEX ix_notification_user_type_group ON notification (user_id, notification_type, group_key)')
+    op.execute('CREATE INDEX ix_notification_user_updated_at ON notification (user_id, updated_at)')
+
+
+def _drop_indexes():
+    op.execute('DROP INDEX IF EXISTS ix_notification_user_type_group')
+    op.execute('DROP INDEX IF EXISTS ix_notification_user_updated_at')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or os.environ.get('PARTITION_NOTIFICATIONS') != '1':
+        return
+    if is_partitioned(bind, 'notification'):
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE notification RENAME TO notification_unpartitioned')
+    op.execute('ALTER TABLE notification_unpartitioned RENAME CONSTRAINT notification_pkey TO notification_unpartitioned_pkey')
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE notification (
+            id INTEGER NOT NULL DEFAULT nextval('notification_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES "user" (id),
+            notification_type VARCHAR(50) NOT NULL,
+            viewed BOOLEAN,
+            data JSON NOT NULL,
+            group_key VARCHAR(100),
+            count INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute('CREATE TABLE notification_pdefault PARTITION OF notification DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min(created_at) FROM notification_unpartitioned')).scalar()
+    ensure_monthly_partitions(bind, 'notification', oldest.date() if oldest else date.today())
+
+    op.execute(f"""
+        INSERT INTO notification ({COLUMNS})
+        SELECT id, user_id, notification_type, viewed, data, group_key, count,
+               COALESCE(created_at, CURRENT_TIMESTAMP), updated_at
+        FROM notification_unpartitioned
+    """)
+    op.execute('ALTER SEQUENCE notification_id_seq OWNED BY notification.id')
+    op.execute('DROP TABLE notification_unpartitioned')
+    _create_indexes()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not is_partitioned(bind, 'notification'):
+        return
+
+    _drop_indexes()
+    op.execute('ALTER TABLE notification RENAME TO notification_partitioned')
+    op.execute('ALTER TABLE notification_partitioned RENAME CONSTRAINT notification_pkey TO notification_partitioned_pkey')
+    op.execute("""
+        CREATE TABLE notification (
+            id INTEGER NOT NULL DEFAULT nextval('notification_id_seq') PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES "user" (id),
+            notification_type VARCHAR(50) NOT NULL,
+            viewed BOOLEAN,
+            data JSON NOT NULL,
+            group_key VARCHAR(100),
+            count INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute(f'INSERT INTO notification ({COLUMNS}) SELECT {COLUMNS} FROM notification_partitioned')
+    op.execute('ALTER SEQUENCE notification_id_seq OWNED BY notification.id')
+    op.execute('DROP TABLE notification_partitioned')
+    _create_indexes()
@@ -0,0 +1,131 @@
+"""move chat room membership into user_chat_association
+
+Revision ID: f1a4c8e2b6d3
+Revises: 8b3f6d2e0c19
+Create Date: 2026-10-19 16:05:33.207418
+
+Memberships listed only in chat_room.user_ids are copied into
+user_chat_association, duplicate memberships are collapsed into the
+oldest row, and 1-to-1 rooms get a dm_key. When a pair already has several
+1-to-1 rooms only the oldest is keyed; the others keep working but are no
+longer found by create-room. Then chat_room.user_ids is dropped.
+
+"""
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a4c8e2b6d3'
+down_revision = '8b3f6d2e0c19'
+branch_labels = None
+depends_on = None
+
+chat_room = sa.table(
+    'chat_room',
+    sa.column('id', sa.Integer),
+    sa.column('is_group', sa.Boolean),
+    sa.column('user_ids', sa.JSON),
+    sa.column('dm_key', sa.String)
+)
+user_chat_association = sa.table(
+    'user_chat_association',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('chat_room_id', sa.Integer)
+)
+user = sa.table('user', sa.column('id', sa.Integer))
+
+
+def _room_members(bind):
+    members = defaultdict(set)
+    for user_id, room_id in bind.execute(sa.select(user_chat_association.c.user_id,
+                                                   user_chat_association.c.chat_room_id)):
+        members[room_id].add(user_id)
+    return members
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Keep the oldest of any duplicate memberships so the unique constraint can be added
+    op.execute("""
+        DELETE FROM user_chat_association WHERE id NOT IN (
+            SELECT keep_id FROM (
+                SELECT min(id) AS keep_id FROM user_chat_association GROUP BY user_id, chat_room_id
+            ) AS oldest
+        )
+    """)
+
+    members = _room_members(bind)
+    existing_users = {user_id for (user_id,) in bind.execute(sa.select(user.c.id))}
+    rooms = bind.execute(sa.select(chat_room.c.id, chat_room.c.is_group, chat_room.c.user_ids)
+                         .order_by(chat_room.c.id)).all()
+
+    missing = []
+    for room_id, is_group, user_ids in rooms:
+        for user_id in {int(member) for member in user_ids or []} & existing_users:
+            if user_id not in members[room_id]:
+                members[room_id].add(user_id)
+                missing.append({'user_id': user_id, 'chat_room_id': room_id})
+    if missing:
+        op.bulk_insert(user_chat_association, missing)
+
+    keyed = set()
+    dm_keys = []
+    for room_id, is_group, _ in rooms:
+        if is_group or len(members[room_id]) != 2:
+            continue
+        low, high = sorted(members[room_id])
+        dm_key = f"{low}:{high}"
+        if dm_key not in keyed:
+            keyed.add(dm_key)
+            dm_keys.append({'room_id': room_id, 'key': dm_key})
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('chat_room', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dm_key', sa.String(length=50), nullable=True))
+
+    # ### end Alembic commands ###
+
+    if dm_keys:
+        bind.execute(chat_room.update().where(chat_room.c.id == sa.bindparam('room_id'))
+                     .values(dm_key=sa.bindparam('key')), dm_keys)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('chat_room', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_chat_room_dm_key', ['dm_key'])
+        batch_op.drop_column('user_ids')
+
+    with op.batch_alter_table('user_chat_association', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_user_chat_association_user_room', ['user_id', 'chat_room_id'])
+        batch_op.create_index('ix_user_chat_association_chat_room_id', ['chat_room_id'], unique=False)
+
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('user_chat_association', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_chat_association_chat_room_id')
+        batch_op.drop_constraint('uq_user_chat_association_user_room', type_='unique')
+
+    with op.batch_alter_table('chat_room', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_ids', sa.JSON(), nullable=True))
+        batch_op.drop_constraint('uq_chat_room_dm_key', type_='unique')
+        batch_op.drop_column('dm_key')
+
+    # ### end Alembic commands ###
+
+    members = _room_members(bind)
+    room_ids = [room_id for (room_id,) in bind.execute(sa.select(chat_room.c.id))]
+    if room_ids:
+        bind.execute(chat_room.update().where(chat_room.c.id == sa.bindparam('room_id'))
+                     .values(user_ids=sa.bindparam('members')),
+                     [{'room_id': room_id, 'members': sorted(members[room_id])} for room_id in room_ids])
+
+    with op.batch_alter_table('chat_room', schema=None) as batch_op:
+        batch_op.alter_column('user_ids', existing_type=sa.JSON(), nullable=False)
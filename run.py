@@ -1,6 +1,14 @@
+import os
+import click
 from app import create_app, db
+from app.config import Config, ProductionConfig
+from app.utils.db_pool import no_statement_timeout
+from app.utils.upload_gc import collect_orphans
+from app.utils.account_deletion import delete_account_data
+from app.utils.notification_pruner import prune_with_config
+from app.utils.chat_archive import archive_chat_messages, maintain_chat_partitions
 
-app = create_app()
+app = create_app(ProductionConfig if os.environ.get('FLASK_ENV') == 'production' else Config)
 
 @app.cli.command("init-db")
 def init_db():
@@ -8,5 +16,63 @@ def init_db():
     db.create_all()
     print("Initialized the database.")
 
+@app.cli.command("delete-account")
+@no_statement_timeout()
+@click.argument("user_id", type=int)
+@click.option("--batch-size", default=None, type=int, help="Rows deleted per committed batch.")
+def delete_account(user_id, batch_size):
+    """Delete a user and all their data, or finish an interrupted deletion."""
+    delete_account_data(user_id, batch_size=batch_size or app.config['ACCOUNT_DELETE_BATCH_SIZE'])
+    print(f"Deleted account {user_id}.")
+
+@app.cli.command("prune-notifications")
+@no_statement_timeout()
+def prune_notifications():
+    """Apply the notification retention settings once."""
+    stats = prune_with_config(app)
+    print(f"Deleted {stats['viewed']} old viewed and {stats['over_cap']} over-cap notifications.")
+    if stats['dropped_partitions']:
+        print(f"Dropped partitions: {', '.join(stats['dropped_partitions'])}")
+
+@app.cli.command("gc-uploads")
+@no_statement_timeout()
+@click.option("--delete", is_flag=True, help="Remove orphaned files instead of only reporting them.")
+@click.option("--batch-size", default=None, type=int, help="Directory entries and rows handled per batch.")
+@click.option("--grace-seconds", default=None, type=int, help="Skip files modified more recently than this.")
+def gc_uploads(delete, batch_size, grace_seconds):
+    """Find files in UPLOAD_FOLDER that no media row references."""
+    stats = collect_orphans(
+        app.config['UPLOAD_FOLDER'],
+        batch_size=batch_size or app.config['UPLOAD_GC_BATCH_SIZE'],
+        grace_seconds=app.config['UPLOAD_GC_GRACE_SECONDS'] if grace_seconds is None else grace_seconds,
+        delete=delete
+    )
+    print(f"Scanned {stats['scanned_files']} files: {stats['orphan_files']} orphaned "
+          f"({stats['orphan_bytes']} bytes), {stats['deleted_files']} deleted.")
+    print(f"{stats['missing_files']} media rows point at missing files.")
+    if stats['missing_media_ids']:
+        print(f"First missing media ids: {stats['missing_media_ids']}")
+
+@app.cli.command("archive-chat")
+@no_statement_timeout()
+@click.option("--older-than-months", default=None, type=int, help="Archive whole months older than this many months.")
+@click.option("--batch-size", default=None, type=int, help="Rows read and deleted per batch.")
+def archive_chat(older_than_months, batch_size):
+    """Create upcoming chat_message partitions, then move old messages into gzipped archive files."""
+    maintain_chat_partitions()
+    months = older_than_months if older_than_months is not None else app.config['CHAT_ARCHIVE_AFTER_MONTHS']
+    if months <= 0:
+        print("Set CHAT_ARCHIVE_AFTER_MONTHS or pass --older-than-months.")
+        return
+    archived = archive_chat_messages(
+        app.config['CHAT_ARCHIVE_FOLDER'],
+        months,
+        batch_size or app.config['CHAT_ARCHIVE_BATCH_SIZE']
+    )
+    for month, count in archived:
+        print(f"{month:%Y-%m}: {count} messages archived.")
+    if not archived:
+        print("Nothing to archive.")
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.config import Config
+from app.models.media import Media
+from app.utils import room_members
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    UPLOAD_FOLDER = tempfile.mkdtemp()
+    CHAT_ARCHIVE_FOLDER = tempfile.mkdtemp()
+    REDIS_URL = None
+    DATABASE_REPLICA_URL = None
+    SQL_QUERY_BUDGET_STRICT = True
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+@pytest.fixture(autouse=True)
+def clean_database(app):
+    yield
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        db.session.remove()
+    room_members._cache.clear()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def register(app, client):
+    """Create a user through the API and return (user_id, auth headers)."""
+    def register(username):
+        response = client.post('/api/auth/register', json={
+            'email': f'{username}@example.com', 'username': username, 'password': 'password'
+        })
+        assert response.status_code == 201, response.get_json()
+        user_id = response.get_json()['user']['id']
+        with app.app_context():
+            token = create_access_token(identity=str(user_id))
+        return user_id, {'Authorization': f'Bearer {token}'}
+    return register
+
+@pytest.fixture
+def make_media(app):
+    def make_media(user_id, **kwargs):
+        with app.app_context():
+            media = Media(user_id=user_id, media_type='image', file_path=f'{user_id}-{os.urandom(4).hex()}.png',
+                          processing_status='ready', **kwargs)
+            db.session.add(media)
+            db.session.commit()
+            return media.id
+    return make_media
@@ -0,0 +1,42 @@
+from datetime import datetime
+from app import db
+from app.models.chat import ChatMessage
+from app.utils.chat_archive import archive_chat_messages, read_archived_messages
+
+def _create_room(client, headers, user_id):
+    return client.post('/api/chat/create-room', json={'user_ids': [user_id]}, headers=headers).get_json()['room_id']
+
+def _add_old_messages(room_ids, sender_id, contents):
+    # Alternate rooms so every batch the export reads spans both
+    for i, content in enumerate(contents):
+        db.session.add(ChatMessage(room_id=room_ids[i % len(room_ids)], sender_id=sender_id,
+                                   content=content, timestamp=datetime(2024, 1, 1 + i)))
+    db.session.commit()
+
+def test_archive_streams_interleaved_rooms_in_batches(app, client, register, tmp_path):
+    alice_id, alice = register('alice')
+    bob_id, _ = register('bob')
+    carol_id, _ = register('carol')
+    rooms = [_create_room(client, alice, bob_id), _create_room(client, alice, carol_id)]
+    with app.app_context():
+        _add_old_messages(rooms, alice_id, [f'm{i}' for i in range(7)])
+        assert archive_chat_messages(str(tmp_path), 3, batch_size=2)[0][1] == 7
+        assert ChatMessage.query.count() == 0
+        assert [m['content'] for m in read_archived_messages(str(tmp_path), rooms[0])] == ['m0', 'm2', 'm4', 'm6']
+        assert [m['content'] for m in read_archived_messages(str(tmp_path), rooms[1])] == ['m1', 'm3', 'm5']
+
+def test_archive_rerun_merges_with_the_existing_month(app, client, register, tmp_path):
+    alice_id, alice = register('alice')
+    bob_id, _ = register('bob')
+    room_id = _create_room(client, alice, bob_id)
+    with app.app_context():
+        _add_old_messages([room_id], alice_id, ['first', 'second'])
+        # A recent message stays behind, so SQLite doesn't hand out archived ids again
+        client.post('/api/chat/send-message', json={'room_id': room_id, 'content': 'recent'}, headers=alice)
+        archive_chat_messages(str(tmp_path), 3, batch_size=1)
+        # As if the previous run stopped before deleting this row
+        db.session.add(ChatMessage(room_id=room_id, sender_id=alice_id, content='third',
+                                   timestamp=datetime(2024, 1, 20)))
+        db.session.commit()
+        archive_chat_messages(str(tmp_path), 3, batch_size=1)
+        assert [m['content'] for m in read_archived_messages(str(tmp_path), room_id)] == ['first', 'second', 'third']
@@ -0,0 +1,30 @@
+import pytest
+
+@pytest.fixture
+def commented_media(client, register, make_media):
+    user_id, headers = register('alice')
+    media_id = make_media(user_id)
+    for i in range(3):
+        assert client.post(f'/api/media/{media_id}/comments', json={'content': f'comment {i}'},
+                           headers=headers).status_code == 201
+    return media_id, headers
+
+def test_comments_are_paged_newest_first(client, commented_media):
+    media_id, headers = commented_media
+    first = client.get(f'/api/media/{media_id}/comments?limit=2', headers=headers).get_json()
+    assert [c['content'] for c in first['comments']] == ['comment 2', 'comment 1']
+    assert first['has_more'] and first['total'] == 3
+
+    rest = client.get(f"/api/media/{media_id}/comments?limit=2&before={first['next_cursor']}",
+                      headers=headers).get_json()
+    assert [c['content'] for c in rest['comments']] == ['comment 0']
+    assert not rest['has_more'] and rest['next_cursor'] is None
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_comment_limit_below_one_is_clamped(client, commented_media, limit):
+    media_id, headers = commented_media
+    response = client.get(f'/api/media/{media_id}/comments?limit={limit}', headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [c['content'] for c in body['comments']] == ['comment 2']
+    assert body['has_more']
@@ -0,0 +1,48 @@
+import time
+from app import socketio
+from app.utils.debounce import Debouncer
+
+INTERVAL = 0.1
+
+# socketio.sleep lets the trailing call's background task run under eventlet too
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        socketio.sleep(0.01)
+    return condition()
+
+def test_burst_runs_first_call_then_one_trailing_call_with_latest_args(app):
+    calls = []
+    debouncer = Debouncer(INTERVAL)
+    assert debouncer.submit('room_1', calls.append, 1)
+    assert not debouncer.submit('room_1', calls.append, 2)
+    assert not debouncer.submit('room_1', calls.append, 3)
+    assert calls == [1]
+
+    assert _wait_for(lambda: len(calls) == 2)
+    socketio.sleep(INTERVAL * 2)
+    assert calls == [1, 3]
+
+def test_keys_are_debounced_separately(app):
+    calls = []
+    debouncer = Debouncer(INTERVAL)
+    assert debouncer.submit('a', calls.append, 'a')
+    assert debouncer.submit('b', calls.append, 'b')
+    assert calls == ['a', 'b']
+
+def test_quiet_key_runs_immediately_again(app):
+    calls = []
+    debouncer = Debouncer(INTERVAL)
+    assert debouncer.submit('a', calls.append, 1)
+    socketio.sleep(INTERVAL * 1.5)
+    assert debouncer.submit('a', calls.append, 2)
+    assert calls == [1, 2]
+
+def test_idle_keys_are_pruned_at_the_limit(app):
+    debouncer = Debouncer(INTERVAL, max_keys=2)
+    debouncer.submit('a', lambda: None)
+    debouncer.submit('b', lambda: None)
+    socketio.sleep(INTERVAL * 1.5)
+    debouncer.submit('c', lambda: None)
+    assert set(debouncer._state) == {'c'}
@@ -0,0 +1,52 @@
+import io
+import os
+import pytest
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from app.utils.file_handler import save_file, sniff_mime_type
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 64
+MP4 = b'\x00\x00\x00\x18ftypisom' + b'\x00' * 64
+MOV = b'\x00\x00\x00\x14ftypqt  ' + b'\x00' * 64
+AVI = b'RIFF\x00\x00\x00\x00AVI LIST' + b'\x00' * 64
+
+def _upload(name, content):
+    return FileStorage(stream=io.BytesIO(content), filename=name)
+
+@pytest.mark.parametrize('content, mime_type', [
+    (PNG, 'image/png'),
+    (JPEG, 'image/jpeg'),
+    (b'GIF89a' + b'\x00' * 16, 'image/gif'),
+    (MP4, 'video/mp4'),
+    (MOV, 'video/quicktime'),
+    (b'\x00\x00\x00\x08moov' + b'\x00' * 16, 'video/quicktime'),
+    (AVI, 'video/x-msvideo'),
+    (b'<?php echo 1; ?>', None),
+    (b'', None),
+])
+def test_sniff_mime_type(content, mime_type):
+    assert sniff_mime_type(content[:16]) == mime_type
+
+@pytest.mark.parametrize('name, content, mime_type', [
+    ('photo.png', PNG, 'image/png'),
+    ('photo.JPG', JPEG, 'image/jpeg'),
+    ('clip.mov', MP4, 'video/mp4'),  # Phones often label MP4 files .mov
+    ('clip.avi', AVI, 'video/x-msvideo'),
+])
+def test_save_file_writes_the_whole_upload(app_context, name, content, mime_type):
+    filename, detected = save_file(_upload(name, content))
+    assert detected == mime_type
+    with open(os.path.join(current_app.config['UPLOAD_FOLDER'], filename), 'rb') as saved:
+        assert saved.read() == content
+
+@pytest.mark.parametrize('name, content', [
+    ('photo.png', JPEG),  # Content does not match the extension
+    ('shell.png', b'<?php echo 1; ?>' * 8),
+    ('photo.bmp', PNG),  # Extension not allowed
+    ('noextension', PNG),
+])
+def test_save_file_rejects_without_writing(app_context, name, content):
+    before = set(os.listdir(current_app.config['UPLOAD_FOLDER']))
+    assert save_file(_upload(name, content)) == (None, None)
+    assert set(os.listdir(current_app.config['UPLOAD_FOLDER'])) == before
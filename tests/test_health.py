@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from app.utils import health_checks
+from app.utils.db_pool import pool_saturated
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(health_checks, '_cache', None)
+
+def _counting_checks(monkeypatch, ready=True):
+    calls = []
+
+    def run_checks():
+        calls.append(1)
+        return ready, {"database": {"ok": ready}}
+
+    monkeypatch.setattr(health_checks, '_run_checks', run_checks)
+    return calls
+
+def test_readiness_reuses_a_fresh_result(app_context, monkeypatch):
+    calls = _counting_checks(monkeypatch)
+    first = health_checks.readiness()
+    assert health_checks.readiness() == first
+    assert len(calls) == 1
+
+def test_readiness_runs_again_once_the_result_expires(app, app_context, monkeypatch):
+    monkeypatch.setitem(app.config, 'HEALTH_CACHE_SECONDS', 0)
+    calls = _counting_checks(monkeypatch)
+    health_checks.readiness()
+    health_checks.readiness()
+    assert len(calls) == 2
+
+def test_ready_endpoint_reports_failures_with_503(client, monkeypatch):
+    _counting_checks(monkeypatch, ready=False)
+    response = client.get('/api/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'not ready'
+
+def test_ready_endpoint_runs_real_checks(client):
+    response = client.get('/api/health/ready')
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['checks']['database']['ok'] and body['checks']['disk']['ok']
+
+def test_liveness_ignores_dependencies(client, monkeypatch):
+    _counting_checks(monkeypatch, ready=False)
+    assert client.get('/api/health/live').status_code == 200
+
+@pytest.mark.parametrize('max_overflow, saturated', [(0, True), (1, False), (-1, False)])
+def test_pool_saturated(max_overflow, saturated):
+    engine = create_engine('sqlite://', poolclass=QueuePool, pool_size=1, max_overflow=max_overflow)
+    with engine.connect():
+        assert pool_saturated(engine.pool) is saturated
+    assert not pool_saturated(engine.pool)
+    engine.dispose()
+
+@pytest.mark.parametrize('authorization, status', [(None, 401), ('Bearer wrong', 401),
+                                                   ('Bearer s3cret', 200)])
+def test_metrics_require_the_token(app, client, monkeypatch, authorization, status):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    headers = {'Authorization': authorization} if authorization else {}
+    assert client.get('/api/metrics', headers=headers).status_code == status
+
+def test_metrics_are_hidden_when_a_required_token_is_missing(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN_REQUIRED', True)
+    assert client.get('/api/metrics').status_code == 404
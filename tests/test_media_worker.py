@@ -0,0 +1,17 @@
+import types
+import pytest
+from app.utils import media_worker
+from app.utils.metrics import QUEUE_DEPTH
+
+class BrokenExecutor:
+    def submit(self, *args):
+        raise RuntimeError('pool is shut down')
+
+def test_failed_submit_leaves_queue_depth_unchanged(app_context, monkeypatch):
+    monkeypatch.setattr(media_worker, '_get_executor', lambda app: BrokenExecutor())
+    gauge = QUEUE_DEPTH.labels('media')
+    before = (media_worker.queue_depth(), gauge._value.get())
+    media = types.SimpleNamespace(id=1, file_path='1.png', media_type='image')
+    with pytest.raises(RuntimeError):
+        media_worker.enqueue_media_processing(media)
+    assert (media_worker.queue_depth(), gauge._value.get()) == before
@@ -0,0 +1,41 @@
+from sqlalchemy import event
+from app import db
+from app.models.notification import Notification
+
+def _group_room(client, register, size, prefix='room'):
+    owner_id, headers = register(f'{prefix}owner')
+    member_ids = [register(f'{prefix}member{i}')[0] for i in range(size)]
+    response = client.post('/api/chat/create-room', json={'is_group': True, 'user_ids': member_ids},
+                           headers=headers)
+    return response.get_json()['room_id'], owner_id, member_ids, headers
+
+def _send(client, room_id, headers, content):
+    return client.post('/api/chat/send-message', json={'room_id': room_id, 'content': content},
+                       headers=headers)
+
+def test_offline_members_get_one_coalesced_notification(app, client, register):
+    room_id, owner_id, member_ids, headers = _group_room(client, register, 3)
+    assert _send(client, room_id, headers, 'first').status_code == 201
+    assert _send(client, room_id, headers, 'second').status_code == 201
+
+    with app.app_context():
+        notifications = Notification.query.filter_by(notification_type=Notification.MESSAGE).all()
+    assert sorted(n.user_id for n in notifications) == sorted(member_ids)
+    assert {n.count for n in notifications} == {2}
+    assert {n.group_key for n in notifications} == {f'room_{room_id}'}
+
+def test_statements_per_message_do_not_grow_with_the_room(app, client, register):
+    def statements_for_send(size, content):
+        room_id, _, _, headers = _group_room(client, register, size, prefix=f'size{size}')
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            assert _send(client, room_id, headers, content).status_code == 201
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        return len(statements)
+
+    assert statements_for_send(2, 'hi') == statements_for_send(8, 'hi')
@@ -0,0 +1,46 @@
+from app import db
+from app.models.user import User
+from app.utils.outbox import stage_after_commit
+
+def _add_user(name):
+    db.session.add(User(email=f'{name}@example.com', username=name, password_hash='x'))
+
+def test_staged_calls_run_after_commit(app_context):
+    calls = []
+    _add_user('alice')
+    stage_after_commit(calls.append, 'pushed')
+    assert calls == []
+    db.session.commit()
+    assert calls == ['pushed']
+
+def test_rollback_drops_staged_calls(app_context):
+    calls = []
+    _add_user('alice')
+    stage_after_commit(calls.append, 'rolled back')
+    db.session.rollback()
+
+    # Nothing carries over into the next transaction
+    _add_user('bob')
+    db.session.commit()
+    assert calls == []
+
+def test_savepoint_release_does_not_dispatch(app_context):
+    calls = []
+    with db.session.begin_nested():
+        _add_user('alice')
+        stage_after_commit(calls.append, 'outer commit only')
+    assert calls == []
+    db.session.commit()
+    assert calls == ['outer commit only']
+
+def test_failing_call_does_not_stop_the_rest(app_context):
+    calls = []
+
+    def fail():
+        raise RuntimeError('socket gone')
+
+    _add_user('alice')
+    stage_after_commit(fail)
+    stage_after_commit(calls.append, 'still sent')
+    db.session.commit()
+    assert calls == ['still sent']
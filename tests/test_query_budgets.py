@@ -0,0 +1,94 @@
+import logging
+import re
+import pytest
+from flask import Response, g
+from app import db
+from app.models.friendship import Friendship
+from app.utils.query_stats import QueryBudgetExceeded, query_budget, record_request_queries
+
+# Every budgeted endpoint runs against a populated account with
+# SQL_QUERY_BUDGET_STRICT on, so a view over its budget fails here.
+
+@pytest.fixture
+def seeded(app, client, register, make_media):
+    alice_id, alice = register('alice')
+    users = {name: register(name) for name in ('bob', 'carol', 'dave')}
+    with app.app_context():
+        for name, (user_id, _) in users.items():
+            db.session.add(Friendship(user_id=alice_id, friend_id=user_id, status='accepted'))
+            db.session.add(Friendship(user_id=user_id, friend_id=alice_id, status='accepted'))
+        db.session.commit()
+
+    media_ids = [make_media(user_id) for user_id, _ in users.values() for _ in range(2)]
+    media_ids += [make_media(alice_id) for _ in range(2)]
+    for media_id in media_ids:
+        for user_id, headers in users.values():
+            assert client.post(f'/api/media/{media_id}/comments', json={'content': 'nice'},
+                               headers=headers).status_code == 201
+            assert client.post(f'/api/media/{media_id}/reactions', json={'type': 'like'},
+                               headers=headers).status_code == 201
+
+    member_ids = [user_id for user_id, _ in users.values()]
+    group_id = client.post('/api/chat/create-room', json={'is_group': True, 'user_ids': member_ids},
+                           headers=alice).get_json()['room_id']
+    direct_id = client.post('/api/chat/create-room', json={'user_ids': [member_ids[0]]},
+                            headers=alice).get_json()['room_id']
+    for room_id in (group_id, direct_id):
+        for i in range(5):
+            for headers in (alice, users['bob'][1]):
+                assert client.post('/api/chat/send-message', json={'room_id': room_id, 'content': f'hi {i}'},
+                                   headers=headers).status_code == 201
+
+    return {'alice': alice, 'media_id': media_ids[0], 'room_id': group_id, 'direct_id': direct_id}
+
+ENDPOINTS = [
+    ('chat.get_messages', '/api/chat/messages/{room_id}'),
+    ('chat.get_messages', '/api/chat/messages/{direct_id}?limit=5'),
+    ('chat.get_my_rooms', '/api/chat/my-rooms'),
+    ('chat.sync', '/api/chat/sync'),
+    ('chat.sync', '/api/chat/sync?since=0:0:0'),
+    ('media.get_media_feed', '/api/media/feed'),
+    ('media.get_friends_media_feed', '/api/media/friends/feed'),
+    ('media.get_comments', '/api/media/{media_id}/comments'),
+    ('notifications.get_notifications', '/api/notifications/'),
+    ('profile.get_profile', '/api/profile/'),
+    ('profile.get_other_profile', '/api/profile/@bob'),
+]
+
+def _queries(response):
+    timing = next(value for value in response.headers.getlist('Server-Timing') if value.startswith('db;'))
+    return int(re.search(r'"(\d+) queries"', timing).group(1))
+
+@pytest.mark.parametrize('endpoint, url', ENDPOINTS, ids=[url for _, url in ENDPOINTS])
+def test_endpoint_stays_within_its_budget(app, client, seeded, endpoint, url):
+    budget = getattr(app.view_functions[endpoint], 'query_budget', None)
+    assert budget is not None, f'{endpoint} has no @query_budget'
+
+    response = client.get(url.format(**seeded), headers=seeded['alice'])
+    assert response.status_code == 200, response.get_json()
+    assert _queries(response) <= budget
+
+def test_query_budget_marks_the_view():
+    @query_budget(3)
+    def view():
+        pass
+    assert view.query_budget == 3
+
+def _finish_request(app, queries):
+    # notifications.get_notifications has a budget of one statement
+    with app.test_request_context('/api/notifications/'):
+        g.sql_queries = queries
+        return record_request_queries(Response())
+
+def test_strict_mode_raises_over_budget(app):
+    assert _finish_request(app, 1).status_code == 200
+    with pytest.raises(QueryBudgetExceeded, match='ran 2 SQL statements, over its budget of 1'):
+        _finish_request(app, 2)
+
+def test_non_strict_mode_logs_over_budget(app, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET_STRICT', False)
+    with caplog.at_level(logging.WARNING):
+        response = _finish_request(app, 2)
+    assert response.status_code == 200
+    assert 'over its budget of 1' in caplog.text
+    assert 'db;dur=' in response.headers['Server-Timing']
@@ -0,0 +1,51 @@
+import threading
+from app import db
+from app.models.media import ReactionCounter
+from app.utils.reactions import add_reaction, remove_reaction, reaction_counts
+
+def test_concurrent_reactions_add_up_across_shards(app, register, make_media):
+    owner_id, _ = register('owner')
+    media_id = make_media(owner_id)
+    user_ids = [register(f'fan{i}')[0] for i in range(12)]
+    barrier = threading.Barrier(len(user_ids))
+    errors = []
+
+    def react(user_id):
+        with app.app_context():
+            try:
+                barrier.wait()
+                assert add_reaction(user_id, media_id, 'like')
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=react, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        assert reaction_counts([media_id])[media_id] == {'like': len(user_ids)}
+        shards = db.session.query(ReactionCounter.shard).filter_by(media_id=media_id).count()
+        assert 1 < shards <= app.config['REACTION_COUNTER_SHARDS']
+
+def test_add_then_remove_returns_the_count_to_zero(app, app_context, register, make_media):
+    owner_id, _ = register('owner')
+    media_id = make_media(owner_id)
+    fan_id, _ = register('fan')
+
+    assert add_reaction(fan_id, media_id, 'like')
+    assert not add_reaction(fan_id, media_id, 'like')  # Already reacted
+    db.session.commit()
+    assert reaction_counts([media_id])[media_id] == {'like': 1}
+
+    assert remove_reaction(fan_id, media_id, 'like')
+    assert not remove_reaction(fan_id, media_id, 'like')
+    db.session.commit()
+    assert media_id not in reaction_counts([media_id])
+    total = db.session.query(db.func.sum(ReactionCounter.count)).filter_by(media_id=media_id).scalar()
+    assert total == 0
@@ -0,0 +1,110 @@
+import pytest
+from app import db
+from app.models.chat import ChatMessage
+from app.routes.chat import _format_sync_cursor, _parse_sync_cursor
+
+@pytest.mark.parametrize('cursor, expected', [
+    ('12:3:4', ((12, 3, 4), ((), (), ()))),
+    ('12:3', ((12, 3, 0), ((), (), ()))),  # Cursors from before removals were tracked
+    ('0:0:0', ((0, 0, 0), ((), (), ()))),
+    ('12:3:4:9,11::2', ((12, 3, 4), ((9, 11), (), (2,)))),
+])
+def test_parse_sync_cursor(cursor, expected):
+    assert _parse_sync_cursor(cursor, 2) == expected
+    assert _format_sync_cursor(*expected) == (cursor if cursor != '12:3' else '12:3:0')
+
+@pytest.mark.parametrize('cursor', ['', '12', '1:2:3:4', '-1:0:0', '1:x:0', 'abc',
+                                    '12:3:4:12::',  # A gap must be below its mark
+                                    '12:3:4:0::', '12:3:4:1,2,3::'])  # At most two gaps each here
+def test_parse_sync_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        _parse_sync_cursor(cursor, 2)
+
+def test_invalid_cursor_is_a_bad_request(client, register):
+    _, headers = register('alice')
+    assert client.get('/api/chat/sync?since=nope', headers=headers).status_code == 400
+
+@pytest.fixture
+def group(client, register):
+    alice_id, alice = register('alice')
+    bob_id, bob = register('bob')
+    room_id = client.post('/api/chat/create-room', json={'is_group': True, 'user_ids': [bob_id]},
+                          headers=alice).get_json()['room_id']
+    return room_id, alice, bob_id, bob
+
+def _send(client, room_id, headers, content):
+    response = client.post('/api/chat/send-message', json={'room_id': room_id, 'content': content},
+                           headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['message_id']
+
+def _sync(client, headers, since=None):
+    url = '/api/chat/sync' if since is None else f'/api/chat/sync?since={since}'
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_sync_returns_messages_after_the_cursor(client, group):
+    room_id, alice, _, bob = group
+    cursor = _sync(client, bob)['cursor']
+    first = _send(client, room_id, alice, 'hello')
+    second = _send(client, room_id, alice, 'again')
+
+    body = _sync(client, bob, cursor)
+    assert [m['id'] for m in body['messages']] == [first, second]
+    assert [room['id'] for room in body['rooms']] == [room_id]
+    assert body['removed_room_ids'] == [] and not body['has_more']
+
+def test_sync_picks_up_a_message_that_committed_below_the_cursor(app, client, group):
+    room_id, alice, _, bob = group
+    _send(client, room_id, alice, 'first')
+    # Leave an id gap, as a send that is still in flight would
+    late_id = _send(client, room_id, alice, 'placeholder')
+    last = _send(client, room_id, alice, 'last')
+    with app.app_context():
+        late = db.session.get(ChatMessage, late_id)
+        sender_id = late.sender_id
+        db.session.delete(late)
+        db.session.commit()
+
+    cursor = _sync(client, bob)['cursor']
+    marks = cursor.split(':')[:3]
+    assert marks[0] == str(last) and cursor.split(':')[3] == str(late_id)
+    assert _sync(client, bob, cursor)['messages'] == []
+
+    with app.app_context():
+        db.session.add(ChatMessage(id=late_id, room_id=room_id, sender_id=sender_id, content='late'))
+        db.session.commit()
+
+    body = _sync(client, bob, cursor)
+    assert [m['id'] for m in body['messages']] == [late_id]
+    assert body['cursor'] == ':'.join(marks)
+
+def test_caught_up_sync_is_empty(client, group):
+    room_id, alice, _, bob = group
+    cursor = _sync(client, bob)['cursor']
+    _send(client, room_id, alice, 'hello')
+    cursor = _sync(client, bob, cursor)['cursor']
+
+    body = _sync(client, bob, cursor)
+    assert body['messages'] == [] and body['rooms'] == [] and body['removed_room_ids'] == []
+    assert body['cursor'] == cursor
+
+def test_sync_reports_rooms_the_user_was_removed_from(client, group):
+    room_id, alice, bob_id, bob = group
+    cursor = _sync(client, bob)['cursor']
+    response = client.delete(f'/api/chat/rooms/{room_id}/members', json={'user_ids': [bob_id]}, headers=alice)
+    assert response.get_json() == {'removed': [bob_id]}
+
+    body = _sync(client, bob, cursor)
+    assert body['removed_room_ids'] == [room_id]
+    assert body['rooms'] == [] and body['messages'] == []
+
+def test_sync_reports_a_direct_room_closed_by_account_deletion(client, register):
+    _, alice = register('alice')
+    bob_id, bob = register('bob')
+    room_id = client.post('/api/chat/create-room', json={'user_ids': [bob_id]}, headers=alice).get_json()['room_id']
+    cursor = _sync(client, bob)['cursor']
+
+    assert client.delete('/api/auth/delete', headers=alice).status_code == 200
+    assert _sync(client, bob, cursor)['removed_room_ids'] == [room_id]